@@ -0,0 +1,36 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# The commands module imports plano, which is slow to import.  It
+# is loaded when one of its names is first used, so that the fast
+# path in ghost.fast starts without it.  The other submodules use
+# only the standard library, so they can be imported on that path
+# too.  Submodule names are excluded, since importing a submodule
+# first looks it up here.
+_submodule_names = frozenset(("commands", "config", "engine", "fast", "gitindex", "gitrefs", "inotify",
+                              "tests"))
+
+def __getattr__(name):
+    if name not in _submodule_names and not name.startswith("__"):
+        from . import commands
+
+        if hasattr(commands, name):
+            return getattr(commands, name)
+
+    raise AttributeError(f"module 'ghost' has no attribute '{name}'")
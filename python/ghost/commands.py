@@ -0,0 +1,2228 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import asyncio as _asyncio
+import concurrent.futures as _futures
+import hashlib as _hashlib
+import json as _json
+import os as _os
+import re as _re
+import shutil as _shutil
+import socket as _socket
+import socketserver as _socketserver
+import subprocess as _subprocess
+import sys as _sys
+import tarfile as _tarfile
+import tempfile as _tempfile
+import threading as _threading
+import time as _time
+
+from plano import *
+
+from . import config as _config
+from . import engine as _engine
+from . import fast as _fast
+from . import gitindex as _gitindex
+from . import gitrefs as _gitrefs
+from . import inotify as _inotify
+from .fast import repo_url
+
+_loaded_config = None
+
+# The config is loaded on first use
+def load_config():
+    global _loaded_config
+
+    if _loaded_config is None:
+        try:
+            _loaded_config = Namespace(**_config.read_config())
+        except _config.ConfigError as e:
+            fail(str(e))
+
+    return _loaded_config
+
+def _get_config_value(name, default=None):
+    return getattr(load_config(), name, default)
+
+# Each git child holds pipes for stdin, stdout, and stderr.  Keep
+# some descriptors in reserve for the rest of the process.
+_fds_per_job = 6
+_reserved_fds = 32
+
+def _get_max_jobs():
+    try:
+        import resource as _resource
+    except ImportError: # pragma: nocover
+        return 64
+
+    soft_limit, _ = _resource.getrlimit(_resource.RLIMIT_NOFILE)
+
+    if soft_limit == _resource.RLIM_INFINITY:
+        return 1024
+
+    return max(1, (soft_limit - _reserved_fds) // _fds_per_job)
+
+def _get_job_count(jobs, item_count):
+    if jobs < 1:
+        jobs = _os.cpu_count() or 1
+
+    return max(1, min(jobs, item_count, _get_max_jobs()))
+
+# ordered=True - Yield results in the order of the input items,
+#                holding back only those that finish early
+# ordered=False - Yield results as soon as they are ready
+def _map_concurrently(function, items, jobs=1, ordered=True):
+    items = list(items)
+    jobs = _get_job_count(jobs, len(items))
+
+    if jobs == 1:
+        for item in items:
+            yield function(item)
+
+        return
+
+    with _futures.ThreadPoolExecutor(jobs) as executor:
+        if ordered:
+            yield from executor.map(function, items)
+        else:
+            futures = [executor.submit(function, x) for x in items]
+
+            for future in _futures.as_completed(futures):
+                yield future.result()
+
+# Like _map_concurrently, for coroutine functions run on the asyncio
+# engine.  Use this for work that is mostly waiting on git processes.
+def _map_async(function, items, jobs=1, ordered=True, group=None, group_jobs=1):
+    items = list(items)
+    return _engine.map_concurrently(function, items, _get_job_count(jobs, len(items)), ordered, group, group_jobs)
+
+def _git_call(repo_dir, *args):
+    return call(["git", "-C", repo_dir, *args], quiet=True)
+
+# Returns the exit code and the combined stdout and stderr instead of
+# raising an error, so one failure doesn't stop a batch
+def _git_run(*args):
+    proc = run(["git", *args], stdout=_subprocess.PIPE, stderr=_subprocess.STDOUT, check=False, quiet=True)
+    return proc.exit_code, proc.stdout_result
+
+# Like _git_run, for coroutines on the asyncio engine
+async def _git_run_async(repo_dir, *args, timeout=None):
+    exit_code, output, _ = await _engine.run_git(repo_dir, *args, timeout=timeout, merge_stderr=True)
+    return exit_code, output
+
+# Prints a summary line for each repo as it finishes, followed by the
+# output of those that failed.  Call check() at the end to fail if any
+# did.
+class _ResultPrinter:
+    def __init__(self, verb, repo_count):
+        self.verb = verb
+        self.repo_count = repo_count
+        self.failures = 0
+
+    def print(self, name, exit_code, output, elapsed_time=None, detail=""):
+        fields = ["## {:<40}".format(name)]
+
+        if elapsed_time is not None:
+            fields.append("{:>7}".format(format_duration(elapsed_time, align=True)))
+
+        if exit_code != 0:
+            self.failures += 1
+            detail = "FAILED"
+
+        if detail:
+            fields.append("{:>12}".format(detail))
+
+        print(" ".join(fields))
+
+        if exit_code != 0:
+            _sys.stdout.write(output)
+
+        _sys.stdout.flush()
+
+    def check(self):
+        if self.failures:
+            fail("Failed to {} {} of {} {}", self.verb, self.failures, self.repo_count,
+                 plural("repo", self.repo_count))
+
+def _get_dir_size(dir):
+    size = 0
+    dirs = [dir]
+
+    while dirs:
+        try:
+            with _os.scandir(dirs.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+                        else:
+                            size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+    return size
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            break
+
+        size /= 1024
+
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+def _read_repo_names(file):
+    names = list()
+
+    for line in read_lines(file):
+        line = line.partition("#")[0].strip()
+
+        if line:
+            names.append(line)
+
+    return names
+
+def _is_repo(dir):
+    return exists(join(dir, ".git"))
+
+# Directories inside a repo that never contain repos worth reporting.
+# Outside a repo they are walked like any other directory, since they
+# might be repos themselves.
+_pruned_dir_names = frozenset(("node_modules", "build", "target", "dist", "__pycache__",
+                               ".venv", "venv", ".tox", ".nox", ".mypy_cache", ".pytest_cache"))
+
+_cache_dir = _config.cache_dir
+_read_cache = _config.read_cache
+_write_cache = _config.write_cache
+_get_racy_time = _config.get_racy_time
+
+# The index records the repos found by each complete recursive
+# search, keyed by absolute path.  It also records [mtime_ns,
+# subdir_names] for the search root and for each directory between
+# it and a repo, but not for the repos or the rest of the tree.
+# Refreshing it checks each recorded repo for its .git and rescans
+# only the recorded directories whose mtime changed, walking any
+# subdirectory they gained.  A repo added inside a directory that
+# held no repos is found by the next recursive search over it.
+class _RepoIndex:
+    file_name = "repos.json"
+
+    # Increase when the rules for walking directories change, so that
+    # entries recorded under the old rules are dropped
+    version = 3
+
+    def __init__(self):
+        data = _read_cache(self.file_name, dict())
+
+        self.roots = data.get("roots", list())
+        self.dirs = dict()
+        self.repos = set()
+        self.modified = False
+
+        if data.get("version") == self.version:
+            self.dirs = data.get("dirs", dict())
+            self.repos = set(data.get("repos", ()))
+
+    def add_root(self, root_dir):
+        root_dir = get_absolute_path(root_dir)
+
+        if root_dir not in self.roots:
+            self.roots.append(root_dir)
+            self.modified = True
+
+    def remove_root(self, root_dir):
+        self.roots.remove(root_dir)
+        self.forget(root_dir)
+        self.modified = True
+
+    # Replace the entries under root_dir with the results of a
+    # complete walk.  The found repos and the keys of scanned are
+    # absolute paths.
+    def record(self, root_dir, scanned, found):
+        root_dir = get_absolute_path(root_dir)
+
+        self.forget(root_dir)
+        self.repos.update(found)
+
+        for dir in _get_parent_dirs(root_dir, found):
+            if dir in scanned:
+                self.dirs[dir] = scanned[dir]
+
+        self.modified = True
+
+    def refresh(self, root_dir):
+        root_dir = get_absolute_path(root_dir)
+
+        if root_dir not in self.dirs and root_dir not in self.repos:
+            scanned = dict()
+            self.record(root_dir, scanned, _find_repos(root_dir, scanned=scanned))
+            return
+
+        racy_time = _get_racy_time()
+
+        for dir in sorted(_get_keys_under(self.dirs, root_dir)):
+            if dir not in self.dirs:
+                continue
+
+            mtime, subdir_names = self.dirs[dir]
+
+            try:
+                current_mtime = _os.stat(dir).st_mtime_ns
+            except OSError:
+                self.forget(dir)
+                continue
+
+            if current_mtime == mtime:
+                continue
+
+            is_repo, current_names = _scan_dir(dir)
+
+            for name in set(subdir_names) - set(current_names):
+                self.forget(join(dir, name))
+
+            for name in set(current_names) - set(subdir_names):
+                subdir = join(dir, name)
+                scanned = dict()
+                self.record(subdir, scanned, _find_repos(subdir, scanned=scanned))
+
+            if is_repo:
+                del self.dirs[dir]
+                self.repos.add(dir)
+            else:
+                self.dirs[dir] = [current_mtime if current_mtime < racy_time else None, current_names]
+
+            self.modified = True
+
+        for repo_dir in list(_get_keys_under(self.repos, root_dir)):
+            if not _is_repo(repo_dir):
+                self.repos.discard(repo_dir)
+                self.modified = True
+
+        self.prune(root_dir)
+
+    # Drop the directory entries under root_dir that no longer lead
+    # to a repo
+    def prune(self, root_dir):
+        needed = _get_parent_dirs(root_dir, _get_keys_under(self.repos, root_dir))
+
+        for dir in list(_get_keys_under(self.dirs, root_dir)):
+            if dir not in needed:
+                del self.dirs[dir]
+                self.modified = True
+
+    def get_repos(self, root_dir, max_depth=None):
+        root_dir = get_absolute_path(root_dir)
+        repos = _get_keys_under(self.repos, root_dir)
+
+        if max_depth is not None:
+            prefix_length = len(root_dir.rstrip("/"))
+            repos = (x for x in repos if x[prefix_length:].count("/") <= max_depth)
+
+        return sorted(repos)
+
+    def forget(self, key):
+        for dir in list(_get_keys_under(self.dirs, key)):
+            del self.dirs[dir]
+            self.modified = True
+
+        for repo_dir in list(_get_keys_under(self.repos, key)):
+            self.repos.discard(repo_dir)
+            self.modified = True
+
+    def save(self):
+        if self.modified:
+            _write_cache(self.file_name, {"version": self.version, "roots": self.roots, "dirs": self.dirs,
+                                          "repos": sorted(self.repos)})
+            self.modified = False
+
+def _get_keys_under(keys, dir):
+    prefix = dir.rstrip("/") + "/"
+    return (x for x in keys if x == dir or x.startswith(prefix))
+
+# Returns root_dir and each directory between it and one of the
+# repo_dirs
+def _get_parent_dirs(root_dir, repo_dirs):
+    dirs = {root_dir}
+
+    for repo_dir in repo_dirs:
+        dir = _os.path.dirname(repo_dir)
+
+        while dir not in dirs and dir.startswith(root_dir):
+            dirs.add(dir)
+            dir = _os.path.dirname(dir)
+
+    return dirs
+
+def _scan_dir(dir):
+    is_repo = False
+    subdir_names = list()
+
+    try:
+        with _os.scandir(dir) as entries:
+            for entry in entries:
+                if entry.name == ".git":
+                    is_repo = True
+                    continue
+
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdir_names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+    if is_repo:
+        subdir_names = [x for x in subdir_names if x not in _pruned_dir_names]
+
+    return is_repo, subdir_names
+
+# Walks only directories, and only as far as max_depth.  It uses the
+# d_type information from scandir instead of a stat per entry and
+# does not follow symlinks.  If scanned is set, it gets [mtime_ns,
+# subdir_names] for each directory that is not a repo, keyed by
+# absolute path, with no mtime where it is too recent to trust.
+def _find_repos(root_dir, max_depth=None, scanned=None):
+    found = list()
+    dirs = [(root_dir, 0)]
+    racy_time = _get_racy_time()
+
+    while dirs:
+        dir, depth = dirs.pop()
+
+        if scanned is not None:
+            try:
+                mtime = _os.stat(dir).st_mtime_ns
+            except OSError:
+                mtime = None
+
+        is_repo, subdir_names = _scan_dir(dir)
+
+        if is_repo:
+            found.append(remove_prefix(dir, "./"))
+        elif scanned is not None:
+            scanned[get_absolute_path(dir)] = [mtime if mtime is not None and mtime < racy_time else None,
+                                               subdir_names]
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+
+        dirs.extend((_os.path.join(dir, x), depth + 1) for x in subdir_names)
+
+    return sorted(found)
+
+# A repo whose git dir or HEAD can't be read, as with a .git file
+# with bad contents, is skipped so that it doesn't stop the others
+def _check_repos(repo_dirs):
+    repos = list()
+
+    for repo_dir in repo_dirs:
+        if _gitrefs.get_branch_info(repo_dir) is None:
+            warn("Skipping '{}': It has no readable git dir", repo_dir)
+            continue
+
+        repos.append(repo_dir)
+
+    return repos
+
+# recursive=True - Find repos under each of the repo_dirs and record
+#                  them in the repo index
+# all_=True - Also report the repos under every directory in the
+#             index, after refreshing it
+def _select_repos(repo_dirs, recursive=False, max_depth=None, all_=False):
+    if not all_:
+        if not repo_dirs:
+            repo_dirs = (".",)
+
+        if not recursive and max_depth is None:
+            return _check_repos([x for x in repo_dirs if _is_repo(x)])
+
+    index = _RepoIndex()
+    repos = list()
+
+    if all_:
+        for root_dir in list(index.roots):
+            if not is_dir(root_dir):
+                index.remove_root(root_dir)
+                continue
+
+            index.refresh(root_dir)
+            repos.extend(index.get_repos(root_dir, max_depth))
+
+        if not index.roots and not repo_dirs:
+            index.save()
+            fail("No directories are indexed.  Use 'ghost status --recursive DIR' to add one.")
+
+        # Indexed repos are reported by absolute path, so use the same
+        # form for the others
+        repo_dirs = [get_absolute_path(x) for x in repo_dirs]
+
+    for root_dir in repo_dirs:
+        if not is_dir(root_dir):
+            continue
+
+        # A search cut off by max_depth is not recorded, since it
+        # doesn't see every repo under the root
+        if max_depth is not None:
+            repos.extend(_find_repos(root_dir, max_depth))
+            continue
+
+        scanned = dict()
+        found = _find_repos(root_dir, scanned=scanned)
+
+        index.add_root(root_dir)
+        index.record(root_dir, scanned, [get_absolute_path(x) for x in found])
+        repos.extend(found)
+
+    index.save()
+
+    return _check_repos(unique(repos))
+
+_get_stat_key = _config.get_stat_key
+
+# The stat data of the files git status reads to produce its branch
+# line, plus the worktree root.  Git replaces these files by renaming
+# a new copy into place, so any change gives a new inode or mtime.
+def _get_status_key(repo_dir):
+    git_dir = _gitrefs.get_git_dir(repo_dir)
+
+    if git_dir is None:
+        return None
+
+    common_dir = _gitrefs.get_common_dir(git_dir)
+    paths = [
+        repo_dir,
+        join(git_dir, "index"),
+        join(git_dir, "HEAD"),
+        join(git_dir, "FETCH_HEAD"),
+        join(common_dir, "packed-refs"),
+        join(common_dir, "config"),
+    ]
+
+    info = _gitrefs.get_branch_info(repo_dir)
+
+    if info is None:
+        return None
+
+    if info.branch is not None:
+        paths.append(join(common_dir, "refs/heads", info.branch))
+
+    if info.upstream_ref is not None:
+        paths.append(join(common_dir, info.upstream_ref))
+
+    return [_get_stat_key(x) for x in paths]
+
+# The cache maps absolute repo paths to [key, output, last_used_time,
+# checked_time_ns, other_dirs], where checked_time_ns is when git
+# status started and other_dirs are the worktree directories holding
+# no tracked files, from gitindex.find_other_dirs()
+class _StatusCache:
+    file_name = "status.json"
+    max_entries = 10000
+
+    def __init__(self):
+        self.entries = _read_cache(self.file_name, dict())
+        self.modified = False
+
+    # The git files in the key don't change when tracked files are
+    # edited, so an entry is used only if the worktree still matches
+    # the index and no directory changed after the check
+    def get(self, repo_dir, key):
+        entry = self.entries.get(get_absolute_path(repo_dir))
+
+        if key is None or entry is None or len(entry) < 5 or entry[0] != key:
+            return None
+
+        if not _gitindex.is_unchanged(repo_dir, since_ns=entry[3], other_dirs=entry[4]):
+            return None
+
+        entry[2] = _time.time()
+        self.modified = True
+
+        return entry[1]
+
+    # Repos with too many directories outside the index to check
+    # quickly are not cached
+    def put(self, repo_dir, key, output, checked_time_ns, other_dirs):
+        if key is None or other_dirs is None:
+            return
+
+        self.entries[get_absolute_path(repo_dir)] = [key, output, _time.time(), checked_time_ns, other_dirs]
+        self.modified = True
+
+    # Evict repos that no longer exist and then the least recently
+    # used entries beyond max_entries
+    def save(self):
+        for path in list(self.entries):
+            if not _is_repo(path):
+                del self.entries[path]
+                self.modified = True
+
+        if len(self.entries) > self.max_entries:
+            paths = sorted(self.entries, key=lambda x: self.entries[x][2], reverse=True)
+
+            for path in paths[self.max_entries:]:
+                del self.entries[path]
+
+            self.modified = True
+
+        if self.modified:
+            _write_cache(self.file_name, self.entries)
+            self.modified = False
+
+# Ahead and behind counts depend only on the two commits, so the
+# cache is keyed on their IDs and shared by all repos.  The entries
+# are kept in least recently used order.
+class _AheadBehindCache:
+    file_name = "ahead-behind.json"
+    max_entries = 10000
+
+    def __init__(self):
+        self.entries = _read_cache(self.file_name, dict())
+        self.modified = False
+
+    async def get(self, repo_dir, commit, upstream_commit):
+        if commit == upstream_commit:
+            return 0, 0
+
+        key = f"{commit}...{upstream_commit}"
+        counts = self.entries.pop(key, None)
+
+        if counts is not None:
+            self.entries[key] = counts
+            self.modified = True
+
+            return tuple(counts)
+
+        exit_code, output, error_output = await _engine.run_git(repo_dir, "rev-list", "--left-right", "--count", key)
+
+        # The commits can be missing, as in a shallow clone.  Show the
+        # branch line without counts then, and don't cache the result.
+        if exit_code != 0:
+            return 0, 0
+
+        counts = [int(x) for x in output.split()]
+
+        self.entries[key] = counts
+        self.modified = True
+
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+        return tuple(counts)
+
+    def save(self):
+        if self.modified:
+            _write_cache(self.file_name, self.entries)
+            self.modified = False
+
+_mirrors_dir = join(_cache_dir, "mirrors")
+
+# Mirrors are never pruned, since clones made with --reference can
+# depend on objects that are no longer reachable in the mirror.
+# Returns None if the mirror can't be created or updated.
+def _update_mirror(owner, repo_name):
+    mirror_dir = join(_mirrors_dir, owner, f"{repo_name}.git")
+
+    if exists(mirror_dir):
+        exit_code, output = _git_run("-C", mirror_dir, "fetch", "--quiet")
+    else:
+        make_parent_dir(mirror_dir, quiet=True)
+
+        exit_code, output = _git_run("clone", "--quiet", "--mirror", repo_url(owner, repo_name), mirror_dir)
+
+        if exit_code == 0:
+            exit_code, output = _git_run("-C", mirror_dir, "config", "gc.pruneExpire", "never")
+
+    if exit_code != 0:
+        warn("Failed to update the mirror of {}/{}: {}", owner, repo_name, output.strip())
+        return None
+
+    return mirror_dir
+
+_clone_profiles = {
+    "full": [],
+    "shallow": ["--depth", "1"],
+    "single-branch": ["--single-branch"],
+    "blobless": ["--filter=blob:none"],
+    "treeless": ["--filter=tree:0"],
+}
+
+# The profile option takes precedence over the profile configured for
+# the repo, which takes precedence over the default profile
+def _get_clone_profile_args(repo_name, profile=None):
+    profiles = dict(_clone_profiles)
+    profiles.update(_get_config_value("clone_profiles", dict()))
+
+    if profile is None:
+        profile = _get_config_value("repo_clone_profiles", dict()).get(repo_name)
+
+    if profile is None:
+        profile = _get_config_value("clone_profile", "full")
+
+    try:
+        args = profiles[profile]
+    except KeyError:
+        fail("Unknown clone profile '{}'.  The known profiles are {}.", profile, ", ".join(sorted(profiles)))
+
+    if is_string(args):
+        args = args.split()
+
+    return list(args)
+
+def _get_clone_args(owner, repo_name, repo_dir, mirror=False, profile=None):
+    args = _get_clone_profile_args(repo_name, profile)
+
+    if mirror:
+        mirror_dir = _update_mirror(owner, repo_name)
+
+        if mirror_dir is not None:
+            args += ["--reference", mirror_dir]
+
+    return args + [repo_url(owner, repo_name), repo_dir]
+
+_tune_settings = (
+    ("feature.manyFiles", "true"),
+    ("core.untrackedCache", "true"),
+    ("core.commitGraph", "true"),
+    ("fetch.writeCommitGraph", "true"),
+    ("gc.writeCommitGraph", "true"),
+    ("core.multiPackIndex", "true"),
+)
+
+# The builtin file system monitor is available on macOS and Windows
+# starting with Git 2.36
+def _has_builtin_fsmonitor():
+    if _sys.platform not in ("darwin", "win32"):
+        return False
+
+    version = call("git version", quiet=True).split()[2]
+    version = tuple(int(x) for x in version.split(".")[:2] if x.isdigit())
+
+    return version >= (2, 36)
+
+# Returns the exit code and output of the first failing step
+def _tune_repo(repo_dir, fsmonitor=False):
+    settings = list(_tune_settings)
+
+    if fsmonitor:
+        settings.append(("core.fsmonitor", "true"))
+
+    for name, value in settings:
+        exit_code, output = _git_run("-C", repo_dir, "config", name, value)
+
+        if exit_code != 0:
+            return exit_code, output
+
+    exit_code, output = _git_run("-C", repo_dir, "commit-graph", "write", "--reachable", "--changed-paths")
+
+    if exit_code != 0:
+        return exit_code, output
+
+    git_dir = _gitrefs.get_git_dir(repo_dir)
+    pack_dir = join(_gitrefs.get_common_dir(git_dir), "objects", "pack")
+
+    if is_dir(pack_dir) and list_dir(pack_dir, "*.pack"):
+        exit_code, output = _git_run("-C", repo_dir, "multi-pack-index", "write")
+
+    return exit_code, output
+
+
+_repo_name_param = CommandParameter("repo_name", positional=True, help="The name of the desired repo")
+_repo_dir_param = CommandParameter("repo_dir", positional=True, help="The directory containing the repo")
+_output_dir_param = CommandParameter("output_dir", positional=True, help="The output directory")
+_owner_param = CommandParameter("owner", help="The GitHub user or organization containing the repo")
+
+# Plano records each command's default on its parameter objects, so
+# commands with different defaults can't share one
+def _jobs_param():
+    return CommandParameter("jobs", short_option="j", help="Run up to JOBS git processes at once (0 for one per CPU)")
+
+_stream_param = CommandParameter("stream", help="Print each repo as soon as it is done instead of in argument order")
+_recursive_param = CommandParameter("recursive", short_option="r", help="Find repos under each directory")
+_max_depth_param = CommandParameter("max_depth", type=int,
+                                    help="Find repos no more than MAX_DEPTH levels down (implies --recursive)")
+_all_param = CommandParameter("all_", display_name="all", short_option="a",
+                              help="Include repos under every directory indexed by a previous recursive search")
+_no_cache_param = CommandParameter("no_cache", help="Run git for every repo instead of using cached results")
+_branch_only_param = CommandParameter("branch_only", help="Report only the branch line, read directly from the repo files")
+_dirty_only_param = CommandParameter("dirty_only", help="Report only repos with changes in the worktree or index")
+_tune_param = CommandParameter("tune", help="Enable git performance features, as 'ghost tune' does")
+_timeout_param = CommandParameter("timeout", type=float, help="Stop any git process that runs for more than TIMEOUT seconds")
+
+@command(parameters=(CommandParameter("repo_name", positional=True, help="The name of the desired repo"),
+                     _output_dir_param, _owner_param,
+                     CommandParameter("repos", metavar="NAMES",
+                                      help="Also clone the repos in NAMES, a comma-separated list"),
+                     CommandParameter("repos_file", metavar="FILE",
+                                      help="Also clone the repos named in FILE, one per line"),
+                     CommandParameter("parent_dir", metavar="DIR",
+                                      help="With several repos, the directory to clone them into"),
+                     _jobs_param(),
+                     CommandParameter("mirror", help="Borrow objects from a local mirror of each repo, "
+                                      "creating or updating it first"),
+                     CommandParameter("profile", help="Clone using the options of PROFILE, such as 'shallow', "
+                                      "'single-branch', 'blobless', or 'treeless'"),
+                     CommandParameter("from_bundle", metavar="FILE",
+                                      help="Restore repos from a file made by 'ghost bundle' instead of GitHub"),
+                     _tune_param, _timeout_param))
+def clone(repo_name=None, output_dir=None, owner=None, repos=None, repos_file=None, parent_dir=None, jobs=1,
+          mirror=False, profile=None, from_bundle=None, tune=False, timeout=None):
+    """
+    Clone repos from GitHub
+
+    With --repos or --repos-file, all the named repos are cloned into
+    the --parent-dir directory, or the current directory by default.
+    The clones run in the background and a summary is printed at the
+    end.  A failed clone does not stop the others.
+
+    Mirrors are kept under ~/.cache/ghost/mirrors.  A clone made from a
+    mirror uses it as an alternate object store, so most of the clone
+    is a local checkout.  Set 'use_mirrors = True' in the config file
+    to use mirrors by default.
+
+    Set 'url_template' in the config file to clone from somewhere other
+    than GitHub, as in 'file:///srv/git/{owner}/{repo_name}.git'.
+
+    The clone profiles select how much history to fetch:
+
+      full           Everything (the default)
+      shallow        Only the latest commit (--depth 1)
+      single-branch  Only the default branch (--single-branch)
+      blobless       All commits and trees, with file contents fetched
+                     on demand (--filter=blob:none)
+      treeless       All commits, with trees and file contents fetched
+                     on demand (--filter=tree:0)
+
+    The config file can set 'clone_profile' to change the default,
+    'repo_clone_profiles' to map repo names to profiles, and
+    'clone_profiles' to map new profile names to lists of git clone
+    options.
+
+    With --from-bundle, the named repos, or all of them if none are
+    named, are restored from a bundle file with no network access.
+    Their origin is set to GitHub, so a later fetch transfers only what
+    changed after the bundle was made.
+    """
+
+    check_program("git")
+
+    owner = nvl(owner, _get_config_value("owner"))
+    mirror = mirror or _get_config_value("use_mirrors", False)
+    tune = tune or _get_config_value("auto_tune", False)
+
+    bulk = repos is not None or repos_file is not None or from_bundle is not None
+    repo_names = [] if repo_name is None else [repo_name]
+
+    if repos is not None:
+        repo_names += [x.strip() for x in repos.split(",") if x.strip()]
+
+    if repos_file is not None:
+        repo_names += _read_repo_names(repos_file)
+
+    repo_names = unique(repo_names)
+
+    if bulk and output_dir is not None:
+        fail("The output dir can be set only when cloning one repo.  Use --parent-dir instead.")
+
+    if from_bundle is not None:
+        _clone_from_bundle(from_bundle, repo_names, parent_dir, owner, jobs, tune, timeout)
+        return
+
+    if not repo_names:
+        fail("No repos to clone")
+
+    if not bulk:
+        output_dir = nvl(output_dir, repo_name)
+
+        run(["git", "clone", *_get_clone_args(owner, repo_name, output_dir, mirror, profile)])
+
+        if tune:
+            _check_tune(output_dir)
+
+        return
+
+    async def clone_repo(repo_name):
+        repo_dir = join(nvl(parent_dir, "."), repo_name)
+
+        # Updating a mirror runs git in this thread, so run it in
+        # another one to keep the event loop free
+        args = await _asyncio.to_thread(_get_clone_args, owner, repo_name, repo_dir, mirror, profile)
+
+        return repo_name, repo_dir, await _git_run_async(None, "clone", "--quiet", *args, timeout=timeout)
+
+    _run_clones(clone_repo, repo_names, jobs, tune)
+
+# clone_function is a coroutine function returning the repo name, the
+# repo dir, and the result of _git_run_async.  Prints a summary line
+# for each repo as it finishes.
+def _run_clones(clone_function, items, jobs, tune=False):
+    fsmonitor = tune and _has_builtin_fsmonitor()
+
+    async def run_clone(item):
+        with Timer() as timer:
+            repo_name, repo_dir, (exit_code, output) = await clone_function(item)
+
+        if exit_code == 0 and tune:
+            exit_code, output = await _asyncio.to_thread(_tune_repo, repo_dir, fsmonitor)
+
+        size = _get_dir_size(join(repo_dir, ".git", "objects")) if exit_code == 0 else 0
+
+        return repo_name, exit_code, output, timer.elapsed_time, size
+
+    printer = _ResultPrinter("clone", len(items))
+
+    for repo_name, exit_code, output, elapsed_time, size in _map_async(run_clone, items, jobs, ordered=False):
+        printer.print(repo_name, exit_code, output, elapsed_time, _format_size(size))
+
+    printer.check()
+
+_workspace_file_name = "ghost-workspace.json"
+
+# The manifest is a JSON object with a list of repos and optional
+# default "owner" and "profile" fields.  Each repo is a name or an
+# object with a "name" and optional "owner", "dir", and "profile"
+# fields.  Dirs are relative to the manifest file.
+def _read_workspace(manifest_file, owner=None):
+    try:
+        data = _json.loads(read(manifest_file))
+    except (OSError, ValueError) as e:
+        fail("Failed to read workspace manifest '{}': {}", manifest_file, e)
+
+    if not isinstance(data, dict) or not isinstance(data.get("repos", list()), list):
+        fail("Workspace manifest '{}' must be an object with a list of repos", manifest_file)
+
+    base_dir = get_parent_dir(manifest_file)
+    owner = nvl(data.get("owner"), owner)
+    repos = list()
+
+    for entry in data.get("repos", list()):
+        if is_string(entry):
+            entry = {"name": entry}
+
+        if not isinstance(entry, dict) or not entry.get("name"):
+            fail("Workspace manifest '{}' has a repo with no name", manifest_file)
+
+        repos.append({
+            "name": entry["name"],
+            "owner": entry.get("owner", owner),
+            "dir": join(base_dir, entry.get("dir", entry["name"])),
+            "profile": entry.get("profile", data.get("profile")),
+        })
+
+    return repos
+
+# Compares the branches on the remote, from one 'git ls-remote', with
+# the remote-tracking refs from the last fetch.  Only branches that
+# the remote's fetch refspec maps to a local ref are compared.
+async def _is_fetch_current(repo_dir, remote="origin", timeout=None):
+    exit_code, output, _ = await _engine.run_git(repo_dir, "ls-remote", "--heads", remote, timeout=timeout)
+
+    if exit_code != 0:
+        return False
+
+    common_dir = _gitrefs.get_common_dir(_gitrefs.get_git_dir(repo_dir))
+    config = _gitrefs.read_config(join(common_dir, "config"))
+    packed_refs = _gitrefs.read_packed_refs(common_dir)
+
+    for line in output.splitlines():
+        commit, _, ref = line.partition("\t")
+
+        if not ref.startswith("refs/heads/"):
+            continue
+
+        tracking_ref = _gitrefs.get_tracking_ref(config, remote, ref)
+
+        if tracking_ref is None:
+            continue
+
+        if _gitrefs.resolve_ref(common_dir, tracking_ref, packed_refs) != commit:
+            return False
+
+    return True
+
+@command(parameters=(CommandParameter("manifest_file", display_name="manifest", metavar="FILE",
+                                      help="The workspace manifest"),
+                     _owner_param, _jobs_param(), _tune_param, _timeout_param))
+def sync(manifest_file=_workspace_file_name, owner=None, jobs=8, tune=False, timeout=None):
+    """
+    Clone or fetch the repos listed in a workspace manifest
+
+    Missing repos are cloned using their clone profile, and existing
+    repos are fetched.  A repo is skipped if 'git ls-remote' shows that
+    its remote branches match what it fetched last.
+
+    The manifest is a JSON file like this:
+
+      {
+        "owner": "ssorj",
+        "profile": "blobless",
+        "repos": ["ghost", {"name": "plano", "dir": "lib/plano", "profile": "full"}]
+      }
+    """
+
+    check_program("git")
+
+    repos = _read_workspace(manifest_file, nvl(owner, _get_config_value("owner")))
+    mirror = _get_config_value("use_mirrors", False)
+    tune = tune or _get_config_value("auto_tune", False)
+    fsmonitor = tune and _has_builtin_fsmonitor()
+
+    for repo in repos:
+        if repo["owner"] is None:
+            fail("No owner for repo '{}'.  Set 'owner' in the manifest or the config file.", repo["name"])
+
+    async def sync_repo(repo):
+        repo_dir = repo["dir"]
+
+        with Timer() as timer:
+            if not _is_repo(repo_dir):
+                action = "cloned"
+                args = await _asyncio.to_thread(_get_clone_args, repo["owner"], repo["name"], repo_dir, mirror,
+                                                repo["profile"])
+                exit_code, output = await _git_run_async(None, "clone", "--quiet", *args, timeout=timeout)
+
+                if exit_code == 0 and tune:
+                    exit_code, output = await _asyncio.to_thread(_tune_repo, repo_dir, fsmonitor)
+            elif await _is_fetch_current(repo_dir, timeout=timeout):
+                action, exit_code, output = "current", 0, ""
+            else:
+                action = "fetched"
+                exit_code, output = await _git_run_async(repo_dir, "fetch", "--quiet", timeout=timeout)
+
+        return repo_dir, action, exit_code, output, timer.elapsed_time
+
+    counts = {"cloned": 0, "fetched": 0, "current": 0}
+    printer = _ResultPrinter("sync", len(repos))
+
+    with Timer() as timer:
+        for repo_dir, action, exit_code, output, elapsed_time in \
+                _map_async(sync_repo, repos, jobs, ordered=False):
+            if exit_code == 0:
+                counts[action] += 1
+
+            printer.print(repo_dir, exit_code, output, elapsed_time, action)
+
+    print()
+    print("Cloned {}, fetched {}, and skipped {} current {} in {}".format(
+        counts["cloned"], counts["fetched"], counts["current"], plural("repo", counts["current"]),
+        format_duration(timer.elapsed_time)))
+
+    printer.check()
+
+_bundle_manifest_name = "ghost-bundle.json"
+
+# Returns the owner and repo name for GitHub URLs and URLs made from
+# the configured URL template, and None otherwise
+def _parse_repo_url(url):
+    template = _fast.get_url_template()
+
+    if template != _fast.default_url_template:
+        pattern = _re.escape(template)
+        pattern = pattern.replace(_re.escape("{owner}"), "(?P<owner>[^/]+)", 1)
+        pattern = pattern.replace(_re.escape("{repo_name}"), "(?P<repo_name>[^/]+)", 1)
+        match = _re.fullmatch(pattern, url)
+
+        if match is not None:
+            return match.group("owner"), match.group("repo_name")
+
+    for prefix in ("git@github.com:", "https://github.com/", "ssh://git@github.com/"):
+        if url.startswith(prefix):
+            path = remove_suffix(remove_suffix(url[len(prefix):], "/"), ".git")
+            owner, _, repo_name = path.partition("/")
+
+            if owner and repo_name and "/" not in repo_name:
+                return owner, repo_name
+
+def _get_repo_identity(repo_dir, owner):
+    git_dir = _gitrefs.get_git_dir(repo_dir)
+    config = _gitrefs.read_config(join(_gitrefs.get_common_dir(git_dir), "config"))
+    url = config.get(("remote", "origin"), dict()).get("url", "")
+
+    return nvl(_parse_repo_url(url), (owner, get_base_name(get_absolute_path(repo_dir))))
+
+def _is_plain_name(name):
+    return is_string(name) and name not in ("", ".", "..") and "/" not in name and "\\" not in name \
+        and "\0" not in name
+
+# The manifest comes from the bundle file, so its names must not lead
+# outside the work and output dirs
+def _check_bundle_repo(repo):
+    name = repo["name"]
+    owner = repo["owner"]
+    member = repo["member"]
+
+    if not _is_plain_name(name):
+        raise ValueError(f"Invalid repo name {name!r}")
+
+    if owner is not None and not _is_plain_name(owner):
+        raise ValueError(f"Invalid repo owner {owner!r}")
+
+    parts = member.split("/") if is_string(member) else ()
+
+    if len(parts) != 2 or not all(_is_plain_name(x) for x in parts) or not parts[1].endswith(".bundle"):
+        raise ValueError(f"Invalid bundle member {member!r}")
+
+def _extract_bundle_member(tar, name):
+    file = tar.extractfile(name)
+
+    if file is None:
+        raise ValueError(f"Member {name!r} is not a regular file")
+
+    return file
+
+def _clone_from_bundle(bundle_file, repo_names, parent_dir, owner, jobs, tune, timeout=None):
+    check_file(bundle_file)
+
+    with temp_dir() as work_dir:
+        try:
+            with _tarfile.open(bundle_file) as tar:
+                manifest = _json.load(_extract_bundle_member(tar, _bundle_manifest_name))
+                repos = manifest["repos"]
+
+                for repo in repos:
+                    _check_bundle_repo(repo)
+
+                if repo_names:
+                    missing = set(repo_names) - set(x["name"] for x in repos)
+
+                    if missing:
+                        fail("The bundle has no {} named {}", plural("repo", len(missing)),
+                             ", ".join(sorted(missing)))
+
+                    repos = [x for x in repos if x["name"] in repo_names]
+
+                # Extract everything up front.  This is one sequential
+                # read of the file, and the tar reader is not safe to
+                # share between threads.
+                for repo in repos:
+                    repo["bundle_file"] = join(work_dir, repo["member"])
+
+                    make_parent_dir(repo["bundle_file"], quiet=True)
+
+                    with _extract_bundle_member(tar, repo["member"]) as source, open(repo["bundle_file"], "wb") as target:
+                        _shutil.copyfileobj(source, target)
+        except (_tarfile.TarError, KeyError, ValueError) as e:
+            fail("Failed to read bundle file '{}': {}", bundle_file, e)
+
+        async def clone_repo(repo):
+            repo_dir = join(nvl(parent_dir, "."), repo["name"])
+            result = await _git_run_async(None, "clone", "--quiet", repo["bundle_file"], repo_dir, timeout=timeout)
+
+            repo_owner = nvl(repo["owner"], owner)
+
+            # Without an owner there is no GitHub URL, and the bundle
+            # file is about to be deleted
+            if result[0] == 0 and repo_owner is None:
+                result = await _git_run_async(repo_dir, "remote", "remove", "origin")
+            elif result[0] == 0:
+                result = await _git_run_async(repo_dir, "remote", "set-url", "origin",
+                                              repo_url(repo_owner, repo["name"]))
+
+            return repo["name"], repo_dir, result
+
+        _run_clones(clone_repo, repos, jobs, tune)
+
+@command(parameters=(CommandParameter("output_file", help="The bundle file to write"),
+                     _jobs_param(), _recursive_param, _max_depth_param, _all_param, _owner_param))
+def bundle(*repo_dirs, output_file="ghost-bundle.tar", jobs=1, recursive=False, max_depth=None, all_=False,
+           owner=None):
+    """
+    Write a bundle file holding the complete history of multiple repos
+
+    Use 'ghost clone --from-bundle FILE' to restore them.  Each repo is
+    named for its GitHub origin, or for its directory if it has none.
+    """
+
+    check_program("git")
+
+    owner = nvl(owner, _get_config_value("owner"))
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+
+    with temp_dir() as work_dir:
+        async def bundle_repo(repo_dir):
+            repo_owner, repo_name = _get_repo_identity(repo_dir, owner)
+            member = f"{nvl(repo_owner, '_')}/{repo_name}.bundle"
+            bundle_file = join(work_dir, member)
+
+            make_parent_dir(bundle_file, quiet=True)
+
+            exit_code, output = await _git_run_async(repo_dir, "bundle", "create", "--quiet",
+                                                     get_absolute_path(bundle_file), "--all")
+
+            return repo_dir, {"owner": repo_owner, "name": repo_name, "member": member}, exit_code, output
+
+        repos = list()
+
+        for repo_dir, repo, exit_code, output in _map_async(bundle_repo, repo_dirs, jobs):
+            if exit_code != 0:
+                warn("Skipping '{}': {}", repo_dir, output.strip())
+                continue
+
+            if repo["member"] in (x["member"] for x in repos):
+                warn("Skipping '{}': A repo named {} is already in the bundle", repo_dir, repo["member"])
+                continue
+
+            repos.append(repo)
+
+        if not repos:
+            fail("No repos to bundle")
+
+        write_json(join(work_dir, _bundle_manifest_name), {"repos": repos})
+
+        with _tarfile.open(output_file, "w") as tar:
+            tar.add(join(work_dir, _bundle_manifest_name), arcname=_bundle_manifest_name)
+
+            for repo in repos:
+                tar.add(join(work_dir, repo["member"]), arcname=repo["member"])
+
+    notice("Wrote {} {} to '{}' ({})", len(repos), plural("repo", len(repos)), output_file,
+           _format_size(get_file_size(output_file)))
+
+# Runs three git processes: init, add, and commit.  The remote goes
+# straight into the new config file.
+async def _init_repo(repo_dir, owner, repo_name=None, tune=False, fsmonitor=False):
+    if _is_repo(repo_dir):
+        return 1, "The directory is already initialized\n"
+
+    repo_name = nvl(repo_name, get_base_name(get_absolute_path(repo_dir)))
+
+    make_dir(repo_dir, quiet=True)
+
+    exit_code, output = await _git_run_async(repo_dir, "init", "--quiet", "--initial-branch", "main")
+
+    if exit_code != 0:
+        return exit_code, output
+
+    with open(join(repo_dir, ".git", "config"), "a") as f:
+        f.write(f'[remote "origin"]\n\turl = {repo_url(owner, repo_name)}\n'
+                f'\tfetch = +refs/heads/*:refs/remotes/origin/*\n')
+
+    for args in (("add", "."), ("commit", "--quiet", "-m", "Initial")):
+        exit_code, output = await _git_run_async(repo_dir, *args)
+
+        if exit_code != 0:
+            return exit_code, output
+
+    if tune:
+        return await _asyncio.to_thread(_tune_repo, repo_dir, fsmonitor)
+
+    return 0, ""
+
+@command(parameters=(_owner_param, _jobs_param(), _tune_param))
+def init(*repo_dirs, repo_name=None, owner=None, jobs=1, tune=False):
+    """
+    Initialize repos
+
+    Each directory gets a repo with an initial commit of its files and
+    an origin on GitHub named for the directory.  With more than one
+    directory, the repos are initialized concurrently and a summary
+    is printed at the end.
+    """
+
+    check_program("git")
+
+    repo_dirs = unique(repo_dirs) or ["."]
+    owner = nvl(owner, _get_config_value("owner"))
+    tune = tune or _get_config_value("auto_tune", False)
+    fsmonitor = tune and _has_builtin_fsmonitor()
+
+    if len(repo_dirs) == 1:
+        if _is_repo(repo_dirs[0]):
+            exit("The directory is already initialized")
+
+        exit_code, output = _asyncio.run(_init_repo(repo_dirs[0], owner, repo_name, tune, fsmonitor))
+
+        if exit_code != 0:
+            fail("Failed to initialize '{}': {}", repo_dirs[0], output.strip())
+
+        print("Make sure this repo exists on GitHub and then push:")
+        print(f"git push -u origin main")
+
+        return
+
+    if repo_name is not None:
+        fail("The repo name can be set only when initializing one directory")
+
+    async def init_repo(repo_dir):
+        with Timer() as timer:
+            exit_code, output = await _init_repo(repo_dir, owner, tune=tune, fsmonitor=fsmonitor)
+
+        return repo_dir, exit_code, output, timer.elapsed_time
+
+    printer = _ResultPrinter("initialize", len(repo_dirs))
+
+    for repo_dir, exit_code, output, elapsed_time in _map_async(init_repo, repo_dirs, jobs, ordered=False):
+        printer.print(repo_dir, exit_code, output, elapsed_time)
+
+    printer.check()
+
+@command(parameters=(_repo_dir_param,))
+def uninit(repo_dir="."):
+    """
+    Uninitialize a repo
+    """
+
+    git_dir = join(repo_dir, ".git")
+
+    check_dir(git_dir)
+    remove(git_dir)
+
+_daemon_socket_file = join(_cache_dir, "daemon.sock")
+
+# Returns a list of status outputs, with None for repos the daemon
+# couldn't report, or None if no daemon is running
+def _query_daemon(repo_dirs):
+    request = {"repo_dirs": [get_absolute_path(x) for x in repo_dirs]}
+
+    try:
+        with _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM) as sock:
+            sock.settimeout(60)
+            sock.connect(_daemon_socket_file)
+            sock.sendall(_json.dumps(request).encode("utf-8") + b"\n")
+
+            with sock.makefile("rb") as f:
+                response = _json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+    outputs = response.get("outputs")
+
+    if not isinstance(outputs, list) or len(outputs) != len(repo_dirs):
+        return None
+
+    return outputs
+
+# Returns the branch line of 'git status -sb', read from the repo files
+# with the counts from the cache, or None if the repo files can't be
+# read
+async def _get_branch_line(repo_dir, ahead_behind_cache):
+    info = _gitrefs.get_branch_info(repo_dir)
+
+    if info is None:
+        return None
+
+    ahead, behind = 0, 0
+
+    if info.commit is not None and info.upstream_commit is not None:
+        ahead, behind = await ahead_behind_cache.get(repo_dir, info.commit, info.upstream_commit)
+
+    return _gitrefs.format_branch_line(info, ahead, behind) + "\n"
+
+@command(parameters=(_jobs_param(), _stream_param, _recursive_param, _max_depth_param, _all_param, _no_cache_param,
+                     _branch_only_param, _dirty_only_param))
+def status(*repo_dirs, jobs=1, stream=False, recursive=False, max_depth=None, all_=False, no_cache=False,
+           branch_only=False, dirty_only=False):
+    """
+    Report the status of multiple repos
+
+    The branch line is read from the repo files, and git counts
+    commits ahead and behind only for commit pairs not seen before.
+    Results are cached until the repo's index, HEAD, or refs change
+    or its worktree no longer matches the index.  If 'ghost daemon' is
+    running, results come from it instead.  With --branch-only, no
+    other git processes are started.  With --dirty-only, repos with
+    nothing to commit are left out.
+    """
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    daemon_outputs = dict()
+
+    if not no_cache and not branch_only:
+        outputs = _query_daemon(repo_dirs)
+
+        if outputs is not None:
+            daemon_outputs = {x: y for x, y in zip(repo_dirs, outputs) if y is not None}
+
+    use_cache = not no_cache and not branch_only and len(daemon_outputs) < len(repo_dirs)
+    cache = _StatusCache() if use_cache else None
+    ahead_behind_cache = _AheadBehindCache()
+
+    async def get_status(repo_dir):
+        if branch_only:
+            return repo_dir, await _get_branch_line(repo_dir, ahead_behind_cache)
+
+        key = None
+        output = daemon_outputs.get(repo_dir)
+
+        if output is None and cache is not None:
+            key = _get_status_key(repo_dir)
+            output = cache.get(repo_dir, key)
+
+        if output is None:
+            checked_time_ns = _time.time_ns()
+            branch_line = await _get_branch_line(repo_dir, ahead_behind_cache)
+
+            # Git status counts commits ahead and behind on every run,
+            # so it makes the branch line only if we can't
+            if branch_line is None:
+                exit_code, output, error_output = await _engine.run_git(repo_dir, "status", "--short", "--branch")
+            else:
+                exit_code, output, error_output = await _engine.run_git(repo_dir, "status", "--short", "--no-branch")
+                output = branch_line + output
+
+            if exit_code != 0:
+                fail("Failed to get the status of '{}': {}", repo_dir, error_output.strip())
+
+            if cache is not None:
+                other_dirs = await _asyncio.to_thread(_gitindex.find_other_dirs, repo_dir)
+                cache.put(repo_dir, key, output, checked_time_ns, other_dirs)
+
+        return repo_dir, output
+
+    try:
+        for repo_dir, output in _map_async(get_status, repo_dirs, jobs, ordered=not stream):
+            if output is None:
+                warn("Skipping '{}': Failed to read its branch", repo_dir)
+                continue
+
+            if dirty_only and output.count("\n") < 2:
+                continue
+
+            _sys.stdout.write("## {:<40} ".format(repo_dir))
+            _sys.stdout.write(output)
+            _sys.stdout.flush()
+    finally:
+        if cache is not None:
+            cache.save()
+
+        ahead_behind_cache.save()
+
+_daemon_watch_mask = (_inotify.IN_MODIFY | _inotify.IN_ATTRIB | _inotify.IN_MOVED_FROM | _inotify.IN_MOVED_TO
+                      | _inotify.IN_CREATE | _inotify.IN_DELETE | _inotify.IN_DELETE_SELF | _inotify.IN_MOVE_SELF
+                      | _inotify.IN_ONLYDIR)
+
+# Keeps the status of each repo it has reported in memory.  Each repo
+# gets an inotify watch on its git dir, on the common dir of a linked
+# worktree, on every directory under its refs, and on every directory
+# of its worktree, and any event drops its entry.  Repos that can't be
+# watched are checked against the same stat data as the status cache.
+#
+# Entries are [generation, output, key, checked_time_ns, other_dirs],
+# where the last three are used only for repos without watches.  An
+# event during a git status run bumps the generation, so a result that
+# might be stale is never stored.
+class _StatusDaemon:
+    def __init__(self):
+        self.lock = _threading.Lock()
+        self.entries = dict()
+        self.generations = dict()
+        self.watches = dict()
+        self.watched_repos = set()
+
+        try:
+            self.inotify = _inotify.Inotify()
+        except OSError as e:
+            warn("Inotify is not available, using stat data only: {}", e)
+            self.inotify = None
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def invalidate(self, repo_dir):
+        self.entries.pop(repo_dir, None)
+        self.generations[repo_dir] = self.generations.get(repo_dir, 0) + 1
+
+    def add_watches(self, repo_dir, dir, recursive):
+        if not recursive:
+            self.watches[self.inotify.add_watch(dir, _daemon_watch_mask)] = (repo_dir, dir, False)
+            return
+
+        for parent_dir, subdir_names, _ in _os.walk(dir):
+            self.watches[self.inotify.add_watch(parent_dir, _daemon_watch_mask)] = (repo_dir, parent_dir, True)
+
+            # Changes in nested repos don't change the status of this one
+            subdir_names[:] = [x for x in subdir_names if x != ".git" and not _is_repo(join(parent_dir, x))]
+
+    # Called with the lock held
+    def watch_repo(self, repo_dir):
+        if self.inotify is None or repo_dir in self.watched_repos:
+            return
+
+        git_dir = _gitrefs.get_git_dir(repo_dir)
+
+        if git_dir is None:
+            return
+
+        common_dir = _gitrefs.get_common_dir(git_dir)
+
+        try:
+            self.add_watches(repo_dir, git_dir, False)
+
+            # A linked worktree shares packed-refs and config with the
+            # main one
+            if common_dir != git_dir:
+                self.add_watches(repo_dir, common_dir, False)
+
+            self.add_watches(repo_dir, join(common_dir, "refs"), True)
+            self.add_watches(repo_dir, repo_dir, True)
+        except OSError as e:
+            warn("Failed to watch '{}', using stat data instead: {}", repo_dir, e)
+
+            for wd, watch in list(self.watches.items()):
+                if watch[0] == repo_dir:
+                    self.inotify.remove_watch(wd)
+                    del self.watches[wd]
+
+            return
+
+        self.watched_repos.add(repo_dir)
+
+    def process_events(self):
+        while True:
+            events = self.inotify.read_events()
+
+            with self.lock:
+                for wd, mask, cookie, name in events:
+                    if mask & _inotify.IN_Q_OVERFLOW:
+                        for repo_dir in list(self.entries):
+                            self.invalidate(repo_dir)
+
+                        continue
+
+                    watch = self.watches.get(wd)
+
+                    if watch is None:
+                        continue
+
+                    repo_dir, dir, recursive = watch
+                    self.invalidate(repo_dir)
+
+                    if mask & _inotify.IN_IGNORED:
+                        del self.watches[wd]
+                        self.watched_repos.discard(repo_dir)
+                        continue
+
+                    if recursive and mask & _inotify.IN_ISDIR and mask & (_inotify.IN_CREATE | _inotify.IN_MOVED_TO):
+                        try:
+                            self.add_watches(repo_dir, join(dir, name), True)
+                        except OSError:
+                            pass
+
+    def get_status(self, repo_dir):
+        if not _is_repo(repo_dir):
+            return None
+
+        with self.lock:
+            self.watch_repo(repo_dir)
+
+            watched = repo_dir in self.watched_repos
+            entry = self.entries.get(repo_dir)
+            generation = self.generations.get(repo_dir, 0)
+
+        key = None if watched else _get_status_key(repo_dir)
+
+        if entry is not None:
+            if watched or (key is not None and entry[2] == key and entry[4] is not None
+                           and _gitindex.is_unchanged(repo_dir, since_ns=entry[3], other_dirs=entry[4])):
+                return entry[1]
+
+        # Don't let git status refresh the index, which would trigger
+        # events for our own run
+        checked_time_ns = _time.time_ns()
+        exit_code, output = _git_run("--no-optional-locks", "-C", repo_dir, "status", "-sb")
+
+        if exit_code != 0:
+            return None
+
+        other_dirs = None if watched else _gitindex.find_other_dirs(repo_dir)
+
+        with self.lock:
+            if self.generations.get(repo_dir, 0) == generation:
+                self.entries[repo_dir] = [generation, output, key, checked_time_ns, other_dirs]
+
+        return output
+
+class _DaemonRequestHandler(_socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = _json.loads(self.rfile.readline())
+            repo_dirs = [str(x) for x in request["repo_dirs"]]
+        except (ValueError, KeyError, TypeError):
+            return
+
+        outputs = list(_map_concurrently(self.server.status_daemon.get_status, repo_dirs, self.server.jobs))
+
+        self.wfile.write(_json.dumps({"outputs": outputs}).encode("utf-8") + b"\n")
+
+class _DaemonServer(_socketserver.ThreadingMixIn, _socketserver.UnixStreamServer):
+    daemon_threads = True
+
+@command(parameters=(_jobs_param(),))
+def daemon(jobs=8):
+    """
+    Serve repo status from memory over a Unix socket
+
+    While the daemon is running, 'ghost status' gets its results from
+    it instead of running git.  The daemon uses inotify to watch the
+    repos it has reported and drops a repo's result when anything in
+    its worktree or git dir changes.  Without inotify, it checks the
+    same stat data as the status cache.
+    """
+
+    check_program("git")
+
+    if exists(_daemon_socket_file):
+        if _query_daemon([]) is not None:
+            fail("A daemon is already running at '{}'", _daemon_socket_file)
+
+        remove(_daemon_socket_file, quiet=True)
+
+    make_dir(_cache_dir, quiet=True)
+
+    server = _DaemonServer(_daemon_socket_file, _DaemonRequestHandler)
+    server.status_daemon = _StatusDaemon()
+    server.jobs = jobs
+
+    try:
+        _os.chmod(_daemon_socket_file, 0o600)
+
+        if server.status_daemon.inotify is not None:
+            _threading.Thread(target=server.status_daemon.process_events, daemon=True).start()
+
+        notice("Listening on '{}'", _daemon_socket_file)
+
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.status_daemon.close()
+        remove(_daemon_socket_file, quiet=True)
+
+def _get_remote_url(repo_dir):
+    git_dir = _gitrefs.get_git_dir(repo_dir)
+
+    if git_dir is None:
+        return None
+
+    config = _gitrefs.read_config(join(_gitrefs.get_common_dir(git_dir), "config"))
+    info = _gitrefs.get_branch_info(repo_dir)
+    remote = "origin"
+
+    if info is not None and info.branch is not None:
+        remote = config.get(("branch", info.branch), dict()).get("remote", remote)
+
+    return config.get(("remote", remote), dict()).get("url")
+
+# Returns "local" for file paths and file URLs
+def _get_url_host(url):
+    if url is None:
+        return "local"
+
+    if "://" in url:
+        host = url.split("://", 1)[1].split("/", 1)[0]
+        host = host.rpartition("@")[2].partition(":")[0]
+    elif ":" in url.split("/", 1)[0]:
+        # The scp-like syntax, user@host:path
+        host = url.split(":", 1)[0].rpartition("@")[2]
+    else:
+        host = ""
+
+    return host or "local"
+
+@command(parameters=(_jobs_param(), _recursive_param, _max_depth_param, _all_param,
+                     CommandParameter("host_jobs", help="Run no more than HOST_JOBS fetches against any one host"),
+                     _timeout_param))
+def fetch(*repo_dirs, jobs=8, recursive=False, max_depth=None, all_=False, host_jobs=4, timeout=None):
+    """
+    Fetch from the remotes of multiple repos
+
+    Each repo fetches from the remote of its current branch, or from
+    origin.  The slowest repos and the total time are reported at the
+    end.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    hosts = {x: _get_url_host(_get_remote_url(x)) for x in repo_dirs}
+
+    async def fetch_repo(repo_dir):
+        with Timer() as timer:
+            exit_code, output = await _git_run_async(repo_dir, "fetch", "--quiet", timeout=timeout)
+
+        return repo_dir, exit_code, output, timer.elapsed_time
+
+    times = list()
+    printer = _ResultPrinter("fetch", len(repo_dirs))
+
+    with Timer() as timer:
+        for repo_dir, exit_code, output, elapsed_time in \
+                _map_async(fetch_repo, repo_dirs, jobs, ordered=False, group=hosts.get, group_jobs=max(1, host_jobs)):
+            times.append((elapsed_time, repo_dir))
+            printer.print(repo_dir, exit_code, output, elapsed_time)
+
+    if times:
+        print()
+        print("Slowest:")
+
+        for elapsed_time, repo_dir in sorted(times, reverse=True)[:5]:
+            print("  {:<40} {:>7}".format(repo_dir, format_duration(elapsed_time, align=True)))
+
+    print()
+    print("Fetched {} {} in {}".format(len(repo_dirs), plural("repo", len(repo_dirs)), format_duration(timer.elapsed_time)))
+
+    printer.check()
+
+@command(parameters=(CommandParameter("args", metavar="[REPO-DIR ...] -- COMMAND"),
+                     _jobs_param(), _stream_param, _recursive_param, _max_depth_param, _all_param,
+                     CommandParameter("shell", help="Run the command with the shell"),
+                     CommandParameter("timeout", type=float,
+                                      help="Stop the command in any repo where it runs for more than TIMEOUT seconds")))
+def exec_(*args, jobs=1, stream=False, recursive=False, max_depth=None, all_=False, shell=False, timeout=None):
+    """
+    Run a command in multiple repos
+
+    The output of each repo is captured and printed in one piece after
+    its command exits.  Repos where the command failed are listed at
+    the end.
+    """
+
+    # The argument parser drops the "--" separator, so use the raw
+    # arguments to find where the command starts
+    if "--" not in ARGS:
+        fail("Missing '--' before the command")
+
+    command_length = len(ARGS) - ARGS.index("--") - 1
+
+    if command_length == 0:
+        fail("Missing command after '--'")
+
+    repo_dirs = _select_repos(args[:-command_length], recursive, max_depth, all_)
+    command = list(args[-command_length:])
+
+    async def exec_repo(repo_dir):
+        exit_code, output, _ = await _engine.run(command, cwd=repo_dir, timeout=timeout, shell=shell,
+                                                 merge_stderr=True)
+        return repo_dir, exit_code, output
+
+    failures = list()
+
+    for repo_dir, exit_code, output in _map_async(exec_repo, repo_dirs, jobs, ordered=not stream):
+        if output and not output.endswith("\n"):
+            output += "\n"
+
+        _sys.stdout.write(f"## {repo_dir}\n{output}")
+        _sys.stdout.flush()
+
+        if exit_code != 0:
+            failures.append((repo_dir, exit_code))
+
+    if failures:
+        print()
+        print("Failed:")
+
+        for repo_dir, exit_code in failures:
+            print("  {:<40} exit code {}".format(repo_dir, exit_code))
+
+        fail("The command failed in {} of {} {}", len(failures), len(repo_dirs), plural("repo", len(repo_dirs)))
+
+@command(parameters=(CommandParameter("pattern", positional=True, help="The regular expression to search for"),
+                     _jobs_param(), _recursive_param, _max_depth_param, _all_param,
+                     CommandParameter("ignore_case", short_option="i", help="Ignore case when matching"),
+                     CommandParameter("max_count", type=int, short_option="m",
+                                      help="Stop after MAX_COUNT matching lines in all")))
+def grep(pattern, *repo_dirs, jobs=8, recursive=False, max_depth=None, all_=False, ignore_case=False, max_count=None):
+    """
+    Search the tracked files of multiple repos
+
+    Matching lines are printed as they are found, prefixed with the
+    repo directory, path, and line number.  Ghost exits with code 1 if
+    nothing matched.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    args = ["grep", "-z", "--line-number", "--no-color"] + (["-i"] if ignore_case else []) + ["-e", pattern]
+
+    lock = _threading.Lock()
+    done = _threading.Event()
+    procs = set()
+    match_count = 0
+
+    def grep_repo(repo_dir):
+        nonlocal match_count
+
+        if done.is_set():
+            return
+
+        prefix = b"" if repo_dir == "." else _os.fsencode(repo_dir.rstrip("/")) + b"/"
+
+        # Stderr goes to a file so that git can't block on a full
+        # stderr pipe while we wait for stdout to end
+        error_file = _tempfile.TemporaryFile()
+        proc = _subprocess.Popen(["git", "-C", repo_dir, *args], stdin=_subprocess.DEVNULL,
+                                 stdout=_subprocess.PIPE, stderr=error_file)
+
+        with lock:
+            procs.add(proc)
+
+        try:
+            for line in proc.stdout:
+                # Output lines are PATH NUL LINE-NUMBER NUL TEXT
+                line = line.replace(b"\0", b":", 2)
+
+                with lock:
+                    if done.is_set():
+                        break
+
+                    _sys.stdout.buffer.write(prefix + line)
+                    _sys.stdout.flush()
+
+                    match_count += 1
+
+                    if max_count is not None and match_count >= max_count:
+                        done.set()
+
+                        for other in procs:
+                            other.kill()
+
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+
+            with lock:
+                procs.discard(proc)
+
+        with error_file:
+            error_file.seek(0)
+            error_output = error_file.read()
+
+        # Exit code 1 means no match
+        if proc.returncode > 1 and not done.is_set():
+            warn("Search failed in '{}': {}", repo_dir, error_output.decode("utf-8", errors="replace").strip())
+
+    for _ in _map_concurrently(grep_repo, repo_dirs, jobs, ordered=False):
+        pass
+
+    if match_count == 0:
+        exit(1)
+
+# Fields are separated by US and records by NUL, so subjects can
+# contain anything but those
+_log_format = "%H%x1f%at%x1f%an%x1f%s"
+
+async def _read_log(repo_dir, since=None, author=None):
+    args = ["log", "-z", f"--format={_log_format}"]
+
+    if since is not None:
+        args.append(f"--since={since}")
+
+    if author is not None:
+        args.append(f"--author={author}")
+
+    exit_code, output, error_output = await _engine.run_git(repo_dir, *args)
+    commits = list()
+
+    for record in output.split("\0"):
+        if not record:
+            continue
+
+        commit, time, author_name, subject = record.strip("\n").split("\x1f", 3)
+        commits.append((int(time), repo_dir, commit, author_name, subject))
+
+    return exit_code, error_output, commits
+
+@command(parameters=(_jobs_param(), _recursive_param, _max_depth_param, _all_param,
+                     CommandParameter("since", help="Show commits more recent than SINCE, as 'git log --since' takes it"),
+                     CommandParameter("author", help="Show commits whose author matches AUTHOR")))
+def log_(*repo_dirs, jobs=8, recursive=False, max_depth=None, all_=False, since="1.week", author=None):
+    """
+    Show the recent commits of multiple repos
+
+    The commits of all the repos are printed in one stream, newest
+    first, with their author date, repo directory, and subject.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+
+    async def read_repo_log(repo_dir):
+        info = _gitrefs.get_branch_info(repo_dir)
+
+        # A repo with no commits yet has no log
+        if info is None or info.commit is None:
+            return repo_dir, 0, "", []
+
+        return (repo_dir, *await _read_log(repo_dir, since, author))
+
+    commits = list()
+
+    for repo_dir, exit_code, error_output, repo_commits in _map_async(read_repo_log, repo_dirs, jobs, ordered=False):
+        if exit_code != 0:
+            warn("Failed to read the log of '{}': {}", repo_dir, error_output.strip())
+
+        commits.extend(repo_commits)
+
+    commits.sort(key=lambda x: x[0], reverse=True)
+
+    for time, repo_dir, commit, author_name, subject in commits:
+        date = _time.strftime("%Y-%m-%d %H:%M", _time.localtime(time))
+        print(f"{date}  {repo_dir:<20} {commit[:10]}  {author_name:<20} {subject}")
+
+def _check_tune(repo_dir):
+    exit_code, output = _tune_repo(repo_dir, _has_builtin_fsmonitor())
+
+    if exit_code != 0:
+        fail("Failed to tune '{}': {}", repo_dir, output.strip())
+
+def _time_status(repo_dir):
+    with Timer() as timer:
+        _git_run("-C", repo_dir, "status", "--porcelain")
+
+    return timer.elapsed_time
+
+@command(parameters=(_jobs_param(), _recursive_param, _max_depth_param, _all_param))
+def tune(*repo_dirs, jobs=1, recursive=False, max_depth=None, all_=False):
+    """
+    Enable git performance features in multiple repos
+
+    This sets feature.manyFiles, core.untrackedCache, core.commitGraph,
+    core.multiPackIndex, and related options, and core.fsmonitor where
+    git has a builtin file system monitor.  It then writes a commit graph
+    with changed-path Bloom filters and a multi-pack index.
+
+    The time of 'git status' before and after is reported for each
+    repo.  Use 'clone --tune' and 'init --tune', or set 'auto_tune =
+    True' in the config file, to tune new repos.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    fsmonitor = _has_builtin_fsmonitor()
+
+    def tune_repo(repo_dir):
+        # The first run warms the file system cache
+        _time_status(repo_dir)
+        before = _time_status(repo_dir)
+
+        exit_code, output = _tune_repo(repo_dir, fsmonitor)
+
+        _time_status(repo_dir)
+        after = _time_status(repo_dir) if exit_code == 0 else None
+
+        return repo_dir, exit_code, output, before, after
+
+    printer = _ResultPrinter("tune", len(repo_dirs))
+
+    for repo_dir, exit_code, output, before, after in _map_concurrently(tune_repo, repo_dirs, jobs):
+        detail = "status {:>6.0f} ms -> {:>6.0f} ms".format(before * 1000, after * 1000) if exit_code == 0 else ""
+        printer.print(repo_dir, exit_code, output, detail=detail)
+
+    printer.check()
+
+# The cache maps absolute directory paths to [mtime_ns, file_bytes,
+# subdir_names, has_git], where file_bytes is the total size of the
+# files directly in the directory.  A directory's mtime does not
+# change when a file in it is rewritten in place, so such changes are
+# seen only when the directory itself changes.
+class _DiskUsageCache:
+    file_name = "du.json"
+
+    def __init__(self, enabled=True):
+        self.dirs = _read_cache(self.file_name, dict()) if enabled else dict()
+        self.enabled = enabled
+        self.untracked = self.dirs.pop("untracked", dict())
+        self.racy_time = _get_racy_time()
+
+    def scan(self, dir):
+        key = get_absolute_path(dir)
+
+        try:
+            mtime = _os.stat(dir).st_mtime_ns
+        except OSError:
+            return 0, 0, (), False
+
+        entry = self.dirs.get(key)
+
+        if entry is not None and entry[0] == mtime:
+            return mtime, entry[1], entry[2], entry[3]
+
+        file_bytes = 0
+        subdir_names = list()
+        has_git = False
+
+        try:
+            with _os.scandir(dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.name == ".git":
+                            has_git = True
+
+                        if entry.is_dir(follow_symlinks=False):
+                            subdir_names.append(entry.name)
+                        else:
+                            file_bytes += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+        if mtime < self.racy_time:
+            self.dirs[key] = [mtime, file_bytes, subdir_names, has_git]
+        else:
+            self.dirs.pop(key, None)
+
+        return mtime, file_bytes, subdir_names, has_git
+
+    # Returns a dict mapping each directory under dir to the size of
+    # its files.  With worktree=True, .git directories and nested
+    # repos are skipped.
+    def walk(self, dir, worktree=False):
+        sizes = dict()
+        mtimes = list()
+        dirs = [dir]
+
+        while dirs:
+            current_dir = dirs.pop()
+            mtime, file_bytes, subdir_names, has_git = self.scan(current_dir)
+
+            if worktree and has_git and current_dir != dir:
+                continue
+
+            sizes[current_dir] = file_bytes
+            mtimes.append(f"{current_dir}:{mtime}")
+
+            for name in subdir_names:
+                if not (worktree and name == ".git"):
+                    dirs.append(join(current_dir, name))
+
+        return sizes, ",".join(sorted(mtimes))
+
+    def get_untracked_bytes(self, repo_dir, signature):
+        key = get_absolute_path(repo_dir)
+        entry = self.untracked.get(key)
+
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        output = _git_call(repo_dir, "ls-files", "--others", "--exclude-standard", "-z")
+        size = 0
+
+        # Nested repos are listed as directories with a trailing slash
+        for path in output.split("\0"):
+            if not path or path.endswith("/"):
+                continue
+
+            try:
+                size += _os.lstat(join(repo_dir, path)).st_size
+            except OSError:
+                continue
+
+        self.untracked[key] = [signature, size]
+
+        return size
+
+    def save(self):
+        if not self.enabled:
+            return
+
+        for key in list(self.untracked):
+            if not _is_repo(key):
+                del self.untracked[key]
+
+        for key in list(self.dirs):
+            if not is_dir(key):
+                del self.dirs[key]
+
+        _write_cache(self.file_name, dict(self.dirs, untracked=self.untracked))
+
+@command(parameters=(_jobs_param(), _recursive_param, _max_depth_param, _all_param, _no_cache_param))
+def du(*repo_dirs, jobs=0, recursive=False, max_depth=None, all_=False, no_cache=False):
+    """
+    Report the disk usage of multiple repos
+
+    For each repo, this reports the size of the worktree without .git,
+    the size of .git, the size of its packs and loose objects, and the
+    size of its untracked files.  Repos are sorted by total size.
+
+    Directory sizes are cached by directory mtime, so running it again
+    on an unchanged workspace reads no file metadata.  A file rewritten
+    in place without any change to its directory is not noticed until
+    the directory changes.  Use --no-cache to measure everything.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    cache = _DiskUsageCache(enabled=not no_cache)
+
+    def measure_repo(repo_dir):
+        git_dir = _gitrefs.get_common_dir(_gitrefs.get_git_dir(repo_dir))
+        objects_dir = join(git_dir, "objects")
+        pack_dir = join(objects_dir, "pack")
+
+        worktree_sizes, signature = cache.walk(repo_dir, worktree=True)
+        git_sizes, _ = cache.walk(git_dir)
+
+        signature = _hashlib.sha1(_json.dumps([_get_status_key(repo_dir), signature]).encode("utf-8")).hexdigest()
+
+        sizes = {
+            "worktree": sum(worktree_sizes.values()),
+            "git": sum(git_sizes.values()),
+            "packs": sum(y for x, y in git_sizes.items() if x == pack_dir),
+            "loose": sum(y for x, y in git_sizes.items()
+                         if get_parent_dir(x) == objects_dir and len(get_base_name(x)) == 2),
+            "untracked": cache.get_untracked_bytes(repo_dir, signature),
+        }
+
+        return repo_dir, sizes
+
+    try:
+        results = list(_map_concurrently(measure_repo, repo_dirs, jobs))
+    finally:
+        cache.save()
+
+    results.sort(key=lambda x: x[1]["worktree"] + x[1]["git"], reverse=True)
+    columns = ("worktree", "git", "packs", "loose", "untracked")
+    template = "{:<43}" + " {:>10}" * len(columns)
+
+    print(template.format("", "worktree", ".git", "packs", "loose", "untracked"))
+
+    for repo_dir, sizes in results:
+        print(template.format(f"## {repo_dir}", *[_format_size(sizes[x]) for x in columns]))
+
+    print(template.format("Total", *[_format_size(sum(x[1][y] for x in results)) for y in columns]))
+
+# Returns None if git failed, so one broken repo doesn't stop the
+# others
+def _count_objects(repo_dir):
+    exit_code, output = _git_run("-C", repo_dir, "count-objects", "-v")
+
+    if exit_code != 0:
+        warn("Skipping '{}': Failed to count objects: {}", repo_dir, output.strip())
+        return None
+
+    counts = dict()
+
+    for line in output.splitlines():
+        name, _, value = line.partition(":")
+        counts[name.strip()] = int(value)
+
+    return counts
+
+# A score of 1 or more means the repo is due for a repack.  Git's own
+# automatic limits are 6,700 loose objects and 50 packs.
+_loose_object_limit = 1000
+_pack_limit = 10
+
+def _get_bloat_score(counts):
+    return counts.get("count", 0) / _loose_object_limit + max(0, counts.get("packs", 0) - 1) / (_pack_limit - 1)
+
+@command(parameters=(_jobs_param(), _recursive_param, _max_depth_param, _all_param,
+                     CommandParameter("cpus", type=int, help="Use no more than CPUS threads for repacking in all"),
+                     CommandParameter("time_budget", type=float, metavar="SECONDS",
+                                      help="Start no new repacks after SECONDS"),
+                     CommandParameter("gc", help="Run 'git gc' instead of 'git repack'"),
+                     CommandParameter("dry_run", help="Report which repos need repacking without repacking them")))
+def maintain(*repo_dirs, jobs=1, recursive=False, max_depth=None, all_=False, cpus=None, time_budget=None,
+             gc=False, dry_run=False):
+    """
+    Repack the repos with the most loose objects and packs
+
+    Object counts come from 'git count-objects -v'.  Repos are ranked by
+    loose objects and number of packs, and those past the limits are
+    repacked worst first with 'git repack -a -d'.
+    """
+
+    check_program("git")
+
+    repo_dirs = _select_repos(repo_dirs, recursive, max_depth, all_)
+    repo_counts = list(_map_concurrently(lambda x: (x, _count_objects(x)), repo_dirs, 0))
+    repo_counts = [(_get_bloat_score(y), x, y) for x, y in repo_counts if y is not None]
+    repo_counts = sorted([x for x in repo_counts if x[0] >= 1], key=lambda x: x[0], reverse=True)
+
+    for score, repo_dir, counts in repo_counts:
+        print("## {:<40} {:>8} loose {:>4} packs {:>6.1f} score".format(repo_dir, counts.get("count", 0),
+                                                                         counts.get("packs", 0), score))
+
+    if not repo_counts:
+        print("No repos need repacking")
+
+    if dry_run or not repo_counts:
+        return
+
+    cpus = max(1, nvl(cpus, _os.cpu_count() or 1))
+    jobs = min(_get_job_count(jobs, len(repo_counts)), cpus)
+    threads = max(1, cpus // jobs)
+    action = ["gc", "--quiet"] if gc else ["repack", "-a", "-d", "--quiet"]
+    start_time = get_time()
+
+    def maintain_repo(repo_dir):
+        if time_budget is not None and get_time() - start_time >= time_budget:
+            return repo_dir, None, "", 0
+
+        with Timer() as timer:
+            exit_code, output = _git_run("-C", repo_dir, "-c", f"pack.threads={threads}", *action)
+
+        return repo_dir, exit_code, output, timer.elapsed_time
+
+    print()
+
+    skipped = 0
+    printer = _ResultPrinter("repack", len(repo_counts))
+
+    for repo_dir, exit_code, output, elapsed_time in \
+            _map_concurrently(maintain_repo, [x[1] for x in repo_counts], jobs, ordered=False):
+        if exit_code is None:
+            skipped += 1
+        else:
+            printer.print(repo_dir, exit_code, output, elapsed_time)
+
+    if skipped:
+        print()
+        print("Skipped {} {} that did not fit in the time budget".format(skipped, plural("repo", skipped)))
+
+    printer.check()
+
+@command(parameters=(_repo_name_param, _output_dir_param, _owner_param))
+def subrepo(repo_name, output_dir, owner=None):
+    """
+    Clone a repo from GitHub into an existing repo subdirectory
+    """
+
+    assert output_dir is not None
+
+    owner = nvl(owner, _get_config_value("owner"))
+
+    run(f"git subrepo clone {repo_url(owner, repo_name)} {output_dir}")
+
+@command(parameters=(_repo_name_param, _owner_param))
+def url(repo_name, owner=None):
+    """
+    Print the URL for a GitHub repo
+    """
+
+    owner = nvl(owner, _get_config_value("owner"))
+
+    print(repo_url(owner, repo_name))
+
+def main():
+    module = _sys.modules[__name__]
+    description = "Commands for working with my GitHub repos"
+
+    PlanoCommand(module, description=description).main()
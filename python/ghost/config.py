@@ -0,0 +1,116 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Read the ghost config file and the cache files under ~/.cache/ghost.
+
+import json as _json
+import os as _os
+import time as _time
+
+home_dir = _os.path.expanduser("~")
+config_dir = _os.path.join(home_dir, ".config/ghost")
+cache_dir = _os.path.join(home_dir, ".cache/ghost")
+
+class ConfigError(Exception):
+    pass
+
+def read_cache(name, default=None):
+    try:
+        with open(_os.path.join(cache_dir, name)) as f:
+            return _json.load(f)
+    except (OSError, ValueError):
+        return default
+
+# Write to a temporary file and rename it so that concurrent ghost
+# processes never see a partial cache
+def write_cache(name, data):
+    path = _os.path.join(cache_dir, name)
+    temp_path = f"{path}.{_os.getpid()}.tmp"
+
+    _os.makedirs(cache_dir, exist_ok=True)
+
+    with open(temp_path, "w") as f:
+        _json.dump(data, f, separators=(",", ":"))
+
+    _os.replace(temp_path, path)
+
+# A file or directory changed within the mtime granularity of the file
+# system might change again without a new mtime.  Data derived from it
+# is cached only if its mtime is older than this.
+def get_racy_time():
+    return _time.time_ns() - 2 * 10**9
+
+def get_stat_key(path):
+    try:
+        st = _os.stat(path)
+    except OSError:
+        return None
+
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+# A config.json file is read as plain data.  Otherwise config.py is
+# run as Python, and the data values it defines are cached by the
+# file's stat data, so it runs again only when it changes.
+def read_config():
+    json_file = _os.path.join(config_dir, "config.json")
+    python_file = _os.path.join(config_dir, "config.py")
+
+    try:
+        with open(json_file) as f:
+            entries = _json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Failed to read config file '{json_file}': {e}")
+    else:
+        if not isinstance(entries, dict):
+            raise ConfigError(f"Config file '{json_file}' does not contain a JSON object")
+
+        return entries
+
+    key = get_stat_key(python_file)
+
+    if key is None:
+        return dict()
+
+    cached = read_cache("config.json", dict())
+
+    if cached.get("key") == key:
+        return cached["entries"]
+
+    # Runpy is imported here since the cached case doesn't need it
+    import runpy
+
+    entries = dict()
+
+    for name, value in runpy.run_path(python_file).items():
+        if name.startswith("_"):
+            continue
+
+        try:
+            _json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+
+        entries[name] = value
+
+    if key[0] < get_racy_time():
+        write_cache("config.json", {"key": key, "entries": entries})
+
+    return entries
@@ -0,0 +1,159 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Run many child processes from one asyncio event loop.  Each process
+# gets its working directory through cwd, so nothing changes the
+# working directory of the ghost process.
+
+import asyncio as _asyncio
+import os as _os
+import subprocess as _subprocess
+import sys as _sys
+import threading as _threading
+
+# The exit code of timeout(1)
+timeout_exit_code = 124
+
+def _kill(proc):
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass
+
+# Returns the exit code, the stdout, and the stderr of the process.
+# With merge_stderr=True, stderr goes to the stdout pipe so the two
+# keep their order, and the returned stderr is empty.  A process that
+# runs past the timeout in seconds is killed.
+async def run(args, cwd=None, timeout=None, shell=False, merge_stderr=False):
+    stderr = _subprocess.STDOUT if merge_stderr else _subprocess.PIPE
+
+    def error(exit_code, message):
+        return (exit_code, message, "") if merge_stderr else (exit_code, "", message)
+
+    try:
+        if shell:
+            proc = await _asyncio.create_subprocess_shell(" ".join(args), cwd=cwd, stdin=_subprocess.DEVNULL,
+                                                          stdout=_subprocess.PIPE, stderr=stderr)
+        else:
+            proc = await _asyncio.create_subprocess_exec(*args, cwd=cwd, stdin=_subprocess.DEVNULL,
+                                                         stdout=_subprocess.PIPE, stderr=stderr)
+    except OSError as e:
+        return error(127, f"{e}\n")
+
+    try:
+        stdout, stderr = await _asyncio.wait_for(proc.communicate(), timeout)
+    except _asyncio.TimeoutError:
+        _kill(proc)
+        await proc.wait()
+
+        return error(timeout_exit_code, f"Timed out after {timeout:g}s\n")
+    except _asyncio.CancelledError:
+        _kill(proc)
+        raise
+
+    return proc.returncode, stdout.decode("utf-8", errors="replace"), (stderr or b"").decode("utf-8", errors="replace")
+
+async def run_git(repo_dir, *args, timeout=None, merge_stderr=False):
+    return await run(["git", *args], cwd=repo_dir, timeout=timeout, merge_stderr=merge_stderr)
+
+_pidfd_supported = None
+
+# Before Python 3.12, asyncio's default child watcher waits for each
+# child in a thread of its own.  Where the kernel supports pidfds, a
+# PidfdChildWatcher waits for them all from the event loop instead.
+# The watcher is global, so it is set only from the main thread.
+# Elsewhere, and on kernels before 5.3, the one thread per child
+# remains.
+def _attach_child_watcher(loop):
+    global _pidfd_supported
+
+    if _sys.version_info >= (3, 12) or _threading.current_thread() is not _threading.main_thread():
+        return
+
+    if _pidfd_supported is None:
+        try:
+            _os.close(_os.pidfd_open(_os.getpid()))
+            _pidfd_supported = True
+        except (AttributeError, OSError):
+            _pidfd_supported = False
+
+    if _pidfd_supported:
+        watcher = _asyncio.PidfdChildWatcher()
+        watcher.attach_loop(loop)
+
+        _asyncio.set_child_watcher(watcher)
+
+# ordered=True - Yield results in the order of the input items,
+#                holding back only those that finish early
+# ordered=False - Yield results as soon as they are ready
+#
+# The function is a coroutine function, and no more than jobs calls
+# of it run at once.  The event loop runs only while the caller waits
+# for the next result.  If the caller stops early or a call raises an
+# error, the remaining calls are cancelled and their processes killed.
+#
+# With a group function, no more than group_jobs calls for items in
+# the same group run at once.  A call takes its group slot before one
+# of the jobs slots, so calls waiting on a busy group don't hold jobs
+# slots that calls in other groups could use.
+def map_concurrently(function, items, jobs=1, ordered=True, group=None, group_jobs=1):
+    loop = _asyncio.new_event_loop()
+    tasks = list()
+
+    _attach_child_watcher(loop)
+
+    async def start():
+        semaphore = _asyncio.Semaphore(jobs)
+        group_semaphores = dict()
+
+        async def call(item):
+            if group is None:
+                async with semaphore:
+                    return await function(item)
+
+            group_semaphore = group_semaphores.setdefault(group(item), _asyncio.Semaphore(group_jobs))
+
+            async with group_semaphore, semaphore:
+                return await function(item)
+
+        return [_asyncio.ensure_future(call(x)) for x in items]
+
+    try:
+        tasks = loop.run_until_complete(start())
+
+        if ordered:
+            for task in tasks:
+                yield loop.run_until_complete(task)
+        else:
+            pending = set(tasks)
+
+            while pending:
+                done, pending = loop.run_until_complete(_asyncio.wait(pending,
+                                                                      return_when=_asyncio.FIRST_COMPLETED))
+
+                for task in done:
+                    yield task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        if tasks:
+            loop.run_until_complete(_asyncio.gather(*tasks, return_exceptions=True))
+
+        loop.close()
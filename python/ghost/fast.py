@@ -0,0 +1,91 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Run simple commands without importing plano, which takes most of
+# ghost's startup time.  Anything this module doesn't recognize,
+# including --help and the logging options, goes to the full command
+# line.
+
+from . import config as _config
+
+default_url_template = "git@github.com:{owner}/{repo_name}.git"
+
+_url_template = None
+
+# The url_template config value replaces the GitHub URL, as for
+# another host or a local copy of the remotes
+def get_url_template():
+    global _url_template
+
+    if _url_template is None:
+        try:
+            _url_template = _config.read_config().get("url_template", default_url_template)
+        except _config.ConfigError:
+            _url_template = default_url_template
+
+    return _url_template
+
+def repo_url(owner, repo_name):
+    return get_url_template().format(owner=owner, repo_name=repo_name)
+
+# Returns (owner, repo_name), or None for anything but the plain
+# forms of 'ghost url'
+def _parse_url_args(args):
+    owner = None
+    repo_name = None
+    args = list(args)
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == "--owner" and args:
+            owner = args.pop(0)
+        elif arg.startswith("--owner="):
+            owner = arg[len("--owner="):]
+        elif arg.startswith("-") or repo_name is not None:
+            return None
+        else:
+            repo_name = arg
+
+    if repo_name is None:
+        return None
+
+    return owner, repo_name
+
+# Returns True if the command was handled here
+def main(args):
+    if not args or args[0] != "url":
+        return False
+
+    parsed_args = _parse_url_args(args[1:])
+
+    if parsed_args is None:
+        return False
+
+    owner, repo_name = parsed_args
+
+    if owner is None:
+        try:
+            owner = _config.read_config().get("owner")
+        except _config.ConfigError:
+            return False
+
+    print(repo_url(owner, repo_name))
+
+    return True
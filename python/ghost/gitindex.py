@@ -0,0 +1,336 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Read the git index and compare its cached stat data against the
+# worktree, the same check git makes before it looks at file content.
+
+import itertools as _itertools
+import os as _os
+import stat as _stat
+import struct as _struct
+
+from . import gitrefs as _gitrefs
+
+_header = _struct.Struct(">4sII")
+_entry_stat = _struct.Struct(">10I")
+
+_flag_assume_valid = 0x8000
+_flag_extended = 0x4000
+_flag_stage = 0x3000
+_flag_name_length = 0x0fff
+_extended_flag_skip_worktree = 0x4000
+_extended_flag_intent_to_add = 0x2000
+
+_mode_gitlink = 0o160000
+_mode_symlink = 0o120000
+_mode_dir = 0o040000
+
+class IndexFormatError(Exception):
+    pass
+
+class IndexEntry:
+    __slots__ = ("path", "ctime", "ctime_ns", "mtime", "mtime_ns", "ino", "mode", "uid", "gid", "size",
+                 "flags", "extended_flags")
+
+    def __init__(self, path, stat_data, flags, extended_flags):
+        self.path = path
+        self.ctime, self.ctime_ns, self.mtime, self.mtime_ns, _, self.ino, self.mode, self.uid, self.gid, self.size \
+            = stat_data
+        self.flags = flags
+        self.extended_flags = extended_flags
+
+    @property
+    def stage(self):
+        return (self.flags & _flag_stage) >> 12
+
+    def __repr__(self):
+        return f"IndexEntry(path={self.path!r}, mode={self.mode:o}, size={self.size})"
+
+class Index:
+    def __init__(self, version, entries, extensions, mtime_ns):
+        self.version = version
+        self.entries = entries
+        self.extensions = extensions
+        self.mtime_ns = mtime_ns
+
+    # A split index keeps most entries in a shared file this module
+    # does not read
+    @property
+    def is_split(self):
+        return b"link" in self.extensions
+
+def _read_varint(data, offset):
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7f
+
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+
+    return value, offset
+
+# Supports index versions 2, 3, and 4
+def read_index(index_file, hash_size=20):
+    with open(index_file, "rb") as f:
+        mtime_ns = _os.fstat(f.fileno()).st_mtime_ns
+        data = f.read()
+
+    if len(data) < _header.size:
+        raise IndexFormatError(f"Index file '{index_file}' is truncated")
+
+    signature, version, count = _header.unpack_from(data)
+
+    if signature != b"DIRC":
+        raise IndexFormatError(f"Index file '{index_file}' has a bad signature")
+
+    if version not in (2, 3, 4):
+        raise IndexFormatError(f"Index file '{index_file}' has unsupported version {version}")
+
+    entries = list()
+    offset = _header.size
+    path = b""
+
+    for _ in range(count):
+        start = offset
+        stat_data = _entry_stat.unpack_from(data, offset)
+        offset += _entry_stat.size + hash_size
+
+        flags = int.from_bytes(data[offset:offset + 2], "big")
+        offset += 2
+        extended_flags = 0
+
+        if version >= 3 and flags & _flag_extended:
+            extended_flags = int.from_bytes(data[offset:offset + 2], "big")
+            offset += 2
+
+        if version == 4:
+            strip_length, offset = _read_varint(data, offset)
+            end = data.index(b"\0", offset)
+            path = path[:len(path) - strip_length] + data[offset:end]
+            offset = end + 1
+        else:
+            end = data.index(b"\0", offset)
+            path = data[offset:end]
+
+            # Entries are padded with one to eight NULs to a multiple
+            # of eight bytes
+            offset = start + ((end - start) // 8 + 1) * 8
+
+        entries.append(IndexEntry(_os.fsdecode(path), stat_data, flags, extended_flags))
+
+    extensions = dict()
+    end = len(data) - hash_size
+
+    while offset + 8 <= end:
+        name = data[offset:offset + 4]
+        size = int.from_bytes(data[offset + 4:offset + 8], "big")
+        extensions[name] = data[offset + 8:offset + 8 + size]
+        offset += 8 + size
+
+    return Index(version, entries, extensions, mtime_ns)
+
+def _matches(entry, st, check_ctime, check_mode, minimal):
+    if entry.mtime != st.st_mtime_ns // 10**9 & 0xffffffff:
+        return False
+
+    if entry.size != st.st_size & 0xffffffff:
+        return False
+
+    if minimal:
+        return True
+
+    if entry.mtime_ns != st.st_mtime_ns % 10**9:
+        return False
+
+    if check_ctime and (entry.ctime != st.st_ctime_ns // 10**9 & 0xffffffff
+                        or entry.ctime_ns != st.st_ctime_ns % 10**9):
+        return False
+
+    if entry.ino != st.st_ino & 0xffffffff or entry.uid != st.st_uid or entry.gid != st.st_gid:
+        return False
+
+    if entry.mode & 0o170000 == _mode_symlink:
+        return _stat.S_ISLNK(st.st_mode)
+
+    if not _stat.S_ISREG(st.st_mode):
+        return False
+
+    if check_mode and bool(entry.mode & 0o100) != bool(st.st_mode & 0o100):
+        return False
+
+    return True
+
+# Returns the index of the repo, with the config settings that decide
+# which stat fields git compares, or None if this module can't judge
+# the repo, as with split indexes
+def _load_index(repo_dir):
+    git_dir = _gitrefs.get_git_dir(repo_dir)
+
+    if git_dir is None:
+        return None
+
+    common_dir = _gitrefs.get_common_dir(git_dir)
+    config = _gitrefs.read_config(_os.path.join(common_dir, "config"))
+    core = config.get(("core", None), dict())
+    object_format = config.get(("extensions", None), dict()).get("objectformat", "sha1")
+
+    check_ctime = core.get("trustctime", "true").lower() not in ("false", "no", "off", "0")
+    check_mode = core.get("filemode", "true").lower() not in ("false", "no", "off", "0")
+    minimal = core.get("checkstat", "default").lower() == "minimal"
+
+    try:
+        index = read_index(_os.path.join(git_dir, "index"), 32 if object_format == "sha256" else 20)
+    except FileNotFoundError:
+        # A new repo has no index until something is staged
+        index = Index(2, list(), dict(), 0)
+    except (OSError, IndexFormatError, ValueError, _struct.error):
+        return None
+
+    if index.is_split:
+        return None
+
+    return index, check_ctime, check_mode, minimal
+
+# Returns the worktree directories that hold tracked files and the
+# paths of submodules
+def _get_tracked_dirs(index):
+    dirs = {""}
+    submodules = set()
+
+    for entry in index.entries:
+        if entry.mode & 0o170000 in (_mode_gitlink, _mode_dir):
+            submodules.add(entry.path)
+            continue
+
+        # Skipped entries, as in a sparse checkout, may have no
+        # directory in the worktree
+        if entry.extended_flags & _extended_flag_skip_worktree:
+            continue
+
+        dir = entry.path.rpartition("/")[0]
+
+        while dir not in dirs:
+            dirs.add(dir)
+            dir = dir.rpartition("/")[0]
+
+    return dirs, submodules
+
+# Returns the worktree directories that hold no tracked files, such as
+# untracked and ignored directories, or None if there are more than
+# limit of them.  Nested repos are listed but not searched.  Git
+# status output changes when files are added to or removed from these
+# directories, so callers check their mtimes as well.
+def find_other_dirs(repo_dir, limit=1000):
+    loaded = _load_index(repo_dir)
+
+    if loaded is None:
+        return None
+
+    tracked_dirs, submodules = _get_tracked_dirs(loaded[0])
+    other_dirs = list()
+    dirs = list(tracked_dirs)
+
+    while dirs:
+        dir = dirs.pop()
+
+        try:
+            with _os.scandir(_os.path.join(repo_dir, dir)) as entries:
+                for entry in entries:
+                    if entry.name == ".git" or not entry.is_dir(follow_symlinks=False):
+                        continue
+
+                    path = f"{dir}/{entry.name}" if dir else entry.name
+
+                    if path in tracked_dirs or path in submodules:
+                        continue
+
+                    other_dirs.append(path)
+
+                    if len(other_dirs) > limit:
+                        return None
+
+                    if not _os.path.lexists(_os.path.join(entry.path, ".git")):
+                        dirs.append(path)
+        except OSError:
+            return None
+
+    return other_dirs
+
+# Returns True if the worktree matches the index by stat data alone:
+# every tracked file has the size, times, and mode recorded in the
+# index, and neither the directories holding tracked files nor the
+# given other_dirs have changed since since_ns.  A directory's mtime
+# changes when files are added to it or removed from it.
+#
+# Untracked files already present at since_ns are not seen, so this
+# tells only whether the worktree changed after a git status run that
+# started at since_ns, with other_dirs from find_other_dirs() after
+# that run.  It can't tell whether a repo is clean by itself.
+#
+# Returns False if the repo is possibly dirty.  That includes files
+# touched without a content change and anything this module can't
+# judge, such as split indexes and unmerged entries.
+def is_unchanged(repo_dir, since_ns, other_dirs=()):
+    loaded = _load_index(repo_dir)
+
+    if loaded is None:
+        return False
+
+    index, check_ctime, check_mode, minimal = loaded
+    tracked_dirs, _ = _get_tracked_dirs(index)
+
+    for entry in index.entries:
+        if entry.stage != 0:
+            return False
+
+        if entry.extended_flags & (_extended_flag_skip_worktree | _extended_flag_intent_to_add):
+            if entry.extended_flags & _extended_flag_intent_to_add:
+                return False
+
+            continue
+
+        if entry.mode & 0o170000 in (_mode_gitlink, _mode_dir):
+            continue
+
+        if entry.flags & _flag_assume_valid:
+            continue
+
+        # Racily clean entries were modified in the same tick the
+        # index was written, so git would check their content
+        if entry.mtime * 10**9 + entry.mtime_ns >= index.mtime_ns:
+            return False
+
+        try:
+            st = _os.lstat(_os.path.join(repo_dir, entry.path))
+        except OSError:
+            return False
+
+        if not _matches(entry, st, check_ctime, check_mode, minimal):
+            return False
+
+    for dir in _itertools.chain(tracked_dirs, other_dirs):
+        try:
+            if _os.stat(_os.path.join(repo_dir, dir)).st_mtime_ns >= since_ns:
+                return False
+        except OSError:
+            return False
+
+    return True
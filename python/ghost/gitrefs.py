@@ -0,0 +1,283 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Read branch and ref information directly from the files under
+# .git, so callers that only need the current branch don't have to
+# start a git process.
+
+import os as _os
+
+class BranchInfo:
+    def __init__(self):
+        self.branch = None          # The branch name, or None if HEAD is detached
+        self.commit = None          # The commit HEAD points at, or None if there are no commits yet
+        self.upstream = None        # The upstream name as git shows it, for example "origin/main"
+        self.upstream_ref = None    # The upstream ref, for example "refs/remotes/origin/main"
+        self.upstream_commit = None # The commit the upstream ref points at, or None if it is gone
+
+    def __repr__(self):
+        return "BranchInfo(branch={}, commit={}, upstream={}, upstream_commit={})".format \
+            (self.branch, self.commit, self.upstream, self.upstream_commit)
+
+# Undecodable bytes are replaced, so a damaged file reads as bad
+# content rather than raising an error
+def _read_text(path):
+    with open(path, errors="replace") as f:
+        return f.read()
+
+# Returns None if repo_dir is not a repo, or if its .git file does not
+# point to a directory
+def get_git_dir(repo_dir):
+    git_dir = _os.path.join(repo_dir, ".git")
+
+    if _os.path.isdir(git_dir):
+        return git_dir
+
+    # Worktrees and submodules have a .git file pointing elsewhere
+    try:
+        content = _read_text(git_dir).strip()
+    except OSError:
+        return None
+
+    if not content.startswith("gitdir:"):
+        return None
+
+    git_dir = _os.path.join(repo_dir, content[len("gitdir:"):].strip())
+
+    if not _os.path.isdir(git_dir):
+        return None
+
+    return git_dir
+
+# Linked worktrees keep their HEAD and index in git_dir but share refs
+# and config with the main repo
+def get_common_dir(git_dir):
+    try:
+        common_dir = _read_text(_os.path.join(git_dir, "commondir")).strip()
+    except OSError:
+        return git_dir
+
+    return _os.path.normpath(_os.path.join(git_dir, common_dir))
+
+# Returns the target ref if HEAD is symbolic and the commit ID if HEAD
+# is detached
+def read_head(git_dir):
+    try:
+        head = _read_text(_os.path.join(git_dir, "HEAD")).strip()
+    except OSError:
+        return None, None
+
+    if head.startswith("ref:"):
+        return head[len("ref:"):].strip(), None
+
+    return None, head
+
+def read_packed_refs(common_dir):
+    refs = dict()
+
+    try:
+        lines = _read_text(_os.path.join(common_dir, "packed-refs")).splitlines()
+    except OSError:
+        return refs
+
+    for line in lines:
+        if not line or line[0] in "#^":
+            continue
+
+        commit, _, ref = line.partition(" ")
+        refs[ref] = commit
+
+    return refs
+
+# Returns None if the ref does not exist
+def resolve_ref(common_dir, ref, packed_refs=None):
+    for _ in range(5):
+        try:
+            value = _read_text(_os.path.join(common_dir, ref)).strip()
+        except OSError:
+            if packed_refs is None:
+                packed_refs = read_packed_refs(common_dir)
+
+            return packed_refs.get(ref)
+
+        if not value.startswith("ref:"):
+            return value
+
+        ref = value[len("ref:"):].strip()
+
+# Returns a dict mapping (section, subsection) to a dict of variables.
+# Section and variable names are lowercased, as in git.  Include
+# directives are not followed.
+def read_config(path):
+    config = dict()
+    section = None
+
+    try:
+        lines = _read_text(path).splitlines()
+    except OSError:
+        return config
+
+    for line in lines:
+        line = line.strip()
+
+        if not line or line[0] in "#;":
+            continue
+
+        if line.startswith("["):
+            header = line[1:line.index("]")] if "]" in line else line[1:]
+            name, _, subsection = header.partition(" ")
+
+            if subsection:
+                subsection = subsection.strip().strip('"').replace('\\"', '"').replace("\\\\", "\\")
+            elif "." in name:
+                # The deprecated [section.subsection] syntax
+                name, _, subsection = name.partition(".")
+
+            section = config.setdefault((name.lower(), subsection or None), dict())
+
+            continue
+
+        if section is None:
+            continue
+
+        name, eq, value = line.partition("=")
+        name = name.strip().lower()
+
+        if not eq:
+            section[name] = "true"
+            continue
+
+        section[name] = _parse_config_value(value)
+
+    return config
+
+def _parse_config_value(value):
+    chars = list()
+    quoted = False
+    escaped = False
+
+    for char in value.strip():
+        if escaped:
+            chars.append({"n": "\n", "t": "\t", "b": "\b"}.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char in "#;" and not quoted:
+            break
+        else:
+            chars.append(char)
+
+    return "".join(chars).strip()
+
+# Maps a ref on a remote to the local ref that tracks it, using the
+# remote's fetch refspecs.  Only the last fetch refspec in the config
+# is read, which covers the standard single-refspec setup.
+def get_tracking_ref(config, remote, merge_ref):
+    if remote == ".":
+        return merge_ref
+
+    refspec = config.get(("remote", remote), dict()).get("fetch")
+
+    if refspec is None:
+        return None
+
+    src, _, dst = refspec.lstrip("+").partition(":")
+
+    if src.endswith("*") and dst.endswith("*") and merge_ref.startswith(src[:-1]):
+        return dst[:-1] + merge_ref[len(src) - 1:]
+
+    if src == merge_ref:
+        return dst
+
+# Returns None if repo_dir is not a repo or its HEAD can't be read
+def get_branch_info(repo_dir):
+    git_dir = get_git_dir(repo_dir)
+
+    if git_dir is None:
+        return None
+
+    common_dir = get_common_dir(git_dir)
+    info = BranchInfo()
+
+    ref, commit = read_head(git_dir)
+
+    if ref is None and commit is None:
+        return None
+
+    if ref is None:
+        info.commit = commit
+        return info
+
+    info.branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+
+    packed_refs = read_packed_refs(common_dir)
+    info.commit = resolve_ref(common_dir, ref, packed_refs)
+
+    config = read_config(_os.path.join(common_dir, "config"))
+    branch_config = config.get(("branch", info.branch), dict())
+    remote = branch_config.get("remote")
+    merge_ref = branch_config.get("merge")
+
+    if remote is None or merge_ref is None:
+        return info
+
+    info.upstream_ref = get_tracking_ref(config, remote, merge_ref)
+
+    if info.upstream_ref is None:
+        return info
+
+    for prefix in ("refs/remotes/", "refs/heads/"):
+        if info.upstream_ref.startswith(prefix):
+            info.upstream = info.upstream_ref[len(prefix):]
+            break
+    else:
+        info.upstream = info.upstream_ref
+
+    info.upstream_commit = resolve_ref(common_dir, info.upstream_ref, packed_refs)
+
+    return info
+
+# The branch line of 'git status -sb'
+def format_branch_line(info, ahead=0, behind=0):
+    if info.branch is None:
+        return "## HEAD (no branch)"
+
+    if info.commit is None:
+        return f"## No commits yet on {info.branch}"
+
+    if info.upstream is None:
+        return f"## {info.branch}"
+
+    if info.upstream_commit is None:
+        return f"## {info.branch}...{info.upstream} [gone]"
+
+    counts = list()
+
+    if ahead:
+        counts.append(f"ahead {ahead}")
+
+    if behind:
+        counts.append(f"behind {behind}")
+
+    if counts:
+        return f"## {info.branch}...{info.upstream} [{', '.join(counts)}]"
+
+    return f"## {info.branch}...{info.upstream}"
@@ -0,0 +1,113 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# A minimal inotify binding using ctypes.  It works only on Linux.
+
+import ctypes as _ctypes
+import ctypes.util as _ctypes_util
+import errno as _errno
+import os as _os
+import struct as _struct
+import sys as _sys
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+
+_event_header = _struct.Struct("iIII")
+
+_libc = None
+
+def _get_libc():
+    global _libc
+
+    if _libc is None:
+        if not _sys.platform.startswith("linux"):
+            raise OSError(_errno.ENOSYS, "inotify is available only on Linux")
+
+        libc = _ctypes.CDLL(_ctypes_util.find_library("c"), use_errno=True)
+
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(_errno.ENOSYS, "The C library has no inotify support")
+
+        libc.inotify_add_watch.argtypes = [_ctypes.c_int, _ctypes.c_char_p, _ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [_ctypes.c_int, _ctypes.c_int]
+
+        _libc = libc
+
+    return _libc
+
+def _raise_errno(path=None):
+    code = _ctypes.get_errno()
+    raise OSError(code, _os.strerror(code), path)
+
+class Inotify:
+    def __init__(self):
+        self.libc = _get_libc()
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+
+        if self.fd < 0:
+            _raise_errno()
+
+    # Returns the watch descriptor.  Watching a path again returns the
+    # same descriptor.
+    def add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, _os.fsencode(path), mask)
+
+        if wd < 0:
+            _raise_errno(path)
+
+        return wd
+
+    def remove_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    # Blocks until events are available and returns them as a list of
+    # (wd, mask, cookie, name) tuples
+    def read_events(self):
+        data = _os.read(self.fd, 64 * 1024)
+        events = list()
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, cookie, length = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+
+            name = _os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            _os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,327 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+import subprocess as _subprocess
+
+from plano import *
+
+# Run in a temporary directory with HOME set to its 'home'
+# subdirectory, so that ghost's config and cache, any running ghost
+# daemon, and the user's git config are left alone
+class test_workspace(working_dir):
+    def __enter__(self):
+        dir = super(test_workspace, self).__enter__()
+
+        self.env = working_env(HOME=get_absolute_path("home"))
+        self.env.__enter__()
+
+        write("home/.gitconfig", "[user]\n\tname = Ghost\n\temail = ghost@example.net\n")
+
+        return dir
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.env.__exit__(exc_type, exc_value, traceback)
+
+        super(test_workspace, self).__exit__(exc_type, exc_value, traceback)
+
+def make_repo(repo_dir):
+    run(f"git init --quiet --initial-branch main {repo_dir}")
+    commit(repo_dir, "README.md")
+
+def commit(repo_dir, file_name):
+    append(join(repo_dir, file_name), "Hello!\n")
+
+    run(f"git -C {repo_dir} add {file_name}")
+    run(f"git -C {repo_dir} commit --quiet -m Hello")
+
+# Make bare copies of a new origin repo under remotes/ghost and point
+# the URL template in the ghost config at them, so that cloning and
+# fetching stay offline
+def make_remotes(*repo_names):
+    make_repo("origin")
+
+    for repo_name in repo_names:
+        run(f"git clone --quiet --bare origin remotes/ghost/{repo_name}.git")
+        run(f"git -C remotes/ghost/{repo_name}.git config uploadpack.allowFilter true")
+
+    url_template = "file://" + get_absolute_path("remotes") + "/{owner}/{repo_name}.git"
+
+    write_json("home/.config/ghost/config.json", {"owner": "ghost", "url_template": url_template})
+
+# Fail unless 'ghost status' reports what 'git status -sb' does.  With
+# --branch-only, only the branch line is compared.  With --dirty-only,
+# clean repos are not reported at all.
+def check_status(repo_dir, options=""):
+    expected = call(f"git -C {repo_dir} status -sb")
+    output = call(f"ghost status {options} {repo_dir}")
+    prefix = "## {:<40} ".format(repo_dir)
+
+    if "--branch-only" in options:
+        expected = expected.splitlines(keepends=True)[0]
+
+    if "--dirty-only" in options and expected.count("\n") < 2:
+        expected = None
+
+    if output != ("" if expected is None else prefix + expected):
+        fail("'ghost status {}' reported {!r}, but git reported {!r}", options, output, expected)
+
+# Sum the import times of the ghost modules loaded by a ghost command,
+# as reported by 'python3 -X importtime', and fail if they exceed the
+# budget in seconds
+def check_import_time(args, budget):
+    proc = run(f"python3 -X importtime {which('ghost')} {args}", stdout=_subprocess.DEVNULL,
+               stderr=_subprocess.PIPE)
+    import_time = 0
+
+    for line in proc.stderr_result.splitlines():
+        fields = line.split("|")
+
+        # Top-level imports are indented by one space
+        if len(fields) == 3 and fields[2].startswith(" ghost"):
+            import_time += int(fields[1]) / 1000000
+
+    if import_time > budget:
+        fail("Importing ghost for 'ghost {}' took {:.3f}s, over the budget of {:.3f}s", args, import_time, budget)
+
+# Loose refs, packed refs, and a linked worktree, read without git
+@test
+def status_refs():
+    with test_workspace():
+        make_repo("origin")
+        run("git clone --quiet origin refs")
+        commit("refs", "a.txt")
+        commit("origin", "b.txt")
+        run("git -C refs fetch --quiet")
+
+        check_status("refs", "--branch-only")
+
+        run("git -C refs pack-refs --all")
+
+        check_status("refs", "--branch-only")
+
+        run("git -C refs worktree add --quiet -b topic ../refs-worktree origin/main")
+        commit("refs-worktree", "c.txt")
+
+        check_status("refs-worktree", "--branch-only")
+        check_status("refs-worktree")
+
+        run("git -C refs checkout --quiet --detach")
+
+        check_status("refs", "--branch-only")
+
+# Each index version, read without git.  An intent-to-add entry has
+# the extended flags of version 3.
+@test
+def status_index():
+    with test_workspace():
+        make_repo("index")
+        commit("index", "a.txt")
+
+        for version in (2, 3, 4):
+            run(f"git -C index update-index --index-version {version}")
+
+            check_status("index")
+            check_status("index", "--dirty-only")
+
+            append("index/a.txt", "Changed\n")
+
+            check_status("index")
+            check_status("index", "--dirty-only")
+
+            run("git -C index checkout --quiet a.txt")
+
+        write("index/b.txt", "Hello!\n")
+        run("git -C index add --intent-to-add b.txt")
+        run("git -C index update-index --index-version 3")
+
+        check_status("index")
+        check_status("index", "--dirty-only")
+
+def get_status_repos(options):
+    output = call(f"ghost status {options}")
+    return [x.split()[1] for x in output.splitlines() if x.startswith("## ")]
+
+# The repo index behind --all finds repos added next to known ones and
+# drops repos and roots that are gone.  A search cut off by
+# --max-depth is not recorded.
+@test
+def status_all():
+    with test_workspace():
+        make_repo("work/group/alpha")
+        make_repo("work/other/beta")
+
+        repos = get_status_repos("--max-depth 1 work")
+        assert repos == [], repos
+
+        proc = run("ghost status --all", check=False)
+        assert proc.exit_code != 0, proc.exit_code
+
+        repos = get_status_repos("--recursive work")
+        assert repos == ["work/group/alpha", "work/other/beta"], repos
+
+        make_repo("work/group/gamma")
+        remove("work/other/beta")
+
+        work_dir = get_absolute_path("work")
+        repos = get_status_repos("--all")
+        assert repos == [f"{work_dir}/group/alpha", f"{work_dir}/group/gamma"], repos
+
+        remove("work")
+
+        proc = run("ghost status --all", check=False)
+        assert proc.exit_code != 0, proc.exit_code
+
+@test
+def clone_command():
+    with test_workspace():
+        make_remotes("alpha", "beta")
+
+        run("ghost clone --mirror alpha")
+        run("ghost clone --mirror --jobs 2 --parent-dir mirrored --repos alpha,beta")
+
+        check_status("alpha")
+
+        run("ghost clone --profile shallow alpha shallow")
+        run("ghost clone --profile blobless --jobs 2 --parent-dir blobless --repos alpha,beta")
+
+        run("ghost bundle --output-file workspace.tar alpha mirrored/beta")
+        run("ghost clone --from-bundle workspace.tar --jobs 2 --parent-dir restored")
+
+        check_status("restored/beta")
+
+@test
+def fetch_command():
+    with test_workspace():
+        make_remotes("alpha")
+
+        run("ghost clone alpha")
+        run("ghost clone --mirror alpha mirrored")
+
+        commit("origin", "b.txt")
+        run("git -C origin push --quiet ../remotes/ghost/alpha.git main")
+
+        run("ghost fetch --jobs 2 --host-jobs 1 alpha mirrored")
+
+        check_status("alpha", "--branch-only")
+
+@test
+def tune_command():
+    with test_workspace():
+        make_remotes("alpha", "beta")
+
+        run("ghost clone --jobs 2 --parent-dir . --repos alpha,beta")
+        run("ghost tune --jobs 2 alpha beta")
+
+        check_status("alpha")
+
+        write("gamma/README.md", "Hello!\n")
+        write("delta/README.md", "Hello!\n")
+        write("epsilon/README.md", "Hello!\n")
+
+        run("ghost init --tune gamma")
+        run("ghost init --tune --jobs 2 delta epsilon")
+
+        check_status("gamma")
+
+@test
+def sync_command():
+    with test_workspace():
+        make_remotes("alpha", "beta")
+
+        with working_dir("synced"):
+            write_json("ghost-workspace.json", {"owner": "ghost", "repos": ["alpha", "beta"]})
+
+            run("ghost sync --jobs 2")
+            run("ghost sync --jobs 2")
+
+            check_status("beta")
+
+@test
+def daemon_command():
+    with test_workspace():
+        make_remotes("alpha")
+
+        run("ghost clone alpha")
+
+        daemon = start("ghost daemon")
+
+        try:
+            await_exists("home/.cache/ghost/daemon.sock")
+
+            check_status("alpha")
+            append("alpha/README.md", "Changed\n")
+
+            # Give the daemon time to see the change
+            sleep(1)
+
+            check_status("alpha")
+        finally:
+            stop(daemon)
+
+# 'ghost url' takes the fast path, which doesn't import plano
+@test
+def url_command():
+    with test_workspace():
+        write_json("home/.config/ghost/config.json", {"owner": "ghost"})
+
+        output = call("ghost url alpha")
+        assert output == "git@github.com:ghost/alpha.git\n", output
+
+        check_import_time("url alpha", budget=0.030)
+
+# The remaining commands, run against the ghost repo on GitHub
+@test
+def github_commands():
+    try:
+        check_port(443, "github.com")
+    except (PlanoError, OSError):
+        raise PlanoTestSkipped("GitHub is not reachable")
+
+    with test_workspace():
+        run("ghost clone --owner ssorj ghost")
+        run("ghost status ghost")
+        run("ghost status --jobs 4 ghost")
+        run("ghost status --jobs 4 --stream ghost")
+        run("ghost status --branch-only ghost")
+        run("ghost status --dirty-only ghost")
+        run("ghost fetch ghost")
+        run("ghost exec --jobs 4 ghost -- git log -1")
+        run("ghost grep --max-count 1 ghost ghost")
+        run("ghost log --since 1.year ghost")
+        run("ghost maintain --dry-run ghost")
+        run("ghost du ghost")
+        run("ghost status --recursive --max-depth 1 .")
+
+        write("ghost-workspace.json", '{"owner": "ssorj", "repos": ["ghost", "plano"]}')
+        run("ghost sync")
+        run("ghost sync")
+        remove("plano")
+
+        remove("ghost")
+
+        make_dir("abc")
+        write("abc/README.md", "Hello!")
+
+        run("ghost init --owner ssorj abc")
+        run("ghost uninit abc")
+
+        write("xyz/README.md", "Hello!")
+
+        run("ghost init --owner ssorj --jobs 2 abc xyz")